@@ -0,0 +1,205 @@
+import asyncio
+
+from grant_executor import (DEFAULT_BATCH_SIZE, chunk_statements, partition_plan, print_plan_summary,
+                            record_success, set_query_tag)
+from run_report import count, timed_call
+from throttling import AdaptiveLimiter, RetryPolicy
+
+
+# Async queries allowed in flight per event loop, and the first and longest wait between
+# two status checks of a running query.
+DEFAULT_MAX_IN_FLIGHT = 32
+DEFAULT_POLL_INTERVAL_SECONDS = 0.02
+DEFAULT_MAX_POLL_INTERVAL_SECONDS = 1.0
+# Pooled sessions the grant statements are spread over.
+DEFAULT_SESSIONS = 2
+
+
+class AsyncQueryEngine:
+    """Submits queries with the connector's execute_async and polls their status by query ID.
+
+    One session runs many async queries at once, so statements in flight overlap their
+    server-side latency without a thread per connection. The connector calls still block,
+    but only for the submit and status round trips, which run on the event loop's default
+    thread pool. The number of queries in flight follows the AIMD limiter.
+    """
+
+    def __init__(self, retry=None, limiter=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 poll_interval_seconds=DEFAULT_POLL_INTERVAL_SECONDS,
+                 max_poll_interval_seconds=DEFAULT_MAX_POLL_INTERVAL_SECONDS):
+        self.retry = retry or RetryPolicy()
+        self.limiter = limiter or AdaptiveLimiter(max_in_flight)
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_poll_interval_seconds = max_poll_interval_seconds
+        # Counted per event loop: the queries of a paused discovery stream must not
+        # starve the grant statements submitted in the meantime.
+        self._in_flight = {}
+
+    async def _acquire(self):
+        loop = asyncio.get_running_loop()
+        while self._in_flight.get(loop, 0) >= int(self.limiter.limit):
+            await asyncio.sleep(self.poll_interval_seconds)
+        self._in_flight[loop] = self._in_flight.get(loop, 0) + 1
+
+    def _release(self):
+        loop = asyncio.get_running_loop()
+        self._in_flight[loop] -= 1
+        if not self._in_flight[loop]:
+            del self._in_flight[loop]
+
+    async def _attempt(self, conn, sql, num_statements, fetch_results):
+        await self._acquire()
+        try:
+            cursor = conn.cursor()
+            if num_statements:
+                await asyncio.to_thread(cursor.execute_async, sql, num_statements=num_statements)
+            else:
+                await asyncio.to_thread(cursor.execute_async, sql)
+            query_id = cursor.sfqid
+            count("async.submitted")
+            delay = self.poll_interval_seconds
+            while True:
+                # Raises the error of a failed query, so it goes through the retry policy.
+                status = await asyncio.to_thread(conn.get_query_status_throw_if_error, query_id)
+                if not conn.is_still_running(status):
+                    break
+                count("async.status_checks")
+                await asyncio.sleep(delay)
+                delay = min(self.max_poll_interval_seconds, delay * 2)
+            if fetch_results:
+                await asyncio.to_thread(cursor.get_results_from_sfqid, query_id)
+            return cursor
+        finally:
+            self._release()
+
+    async def run(self, conn, sql, num_statements=None, description="query", fetch_results=True):
+        """Run one query asynchronously, retried like a synchronous one, and return its cursor."""
+        with timed_call("async.query"):
+            return await self.retry.call_async(
+                lambda: self._attempt(conn, sql, num_statements, fetch_results), self.limiter, description)
+
+    def iter_completed(self, conn, queries, description="query"):
+        """Submit every (key, sql) query at once and yield (key, cursor, error) as each one finishes.
+
+        The event loop only runs while the caller waits for the next result; the queries
+        themselves keep running on the server in between.
+        """
+        queries = list(queries)
+        if not queries:
+            return
+
+        async def run(key, sql):
+            try:
+                return key, await self.run(conn, sql, description=f"{description} of {key}"), None
+            except Exception as e:
+                return key, None, e
+
+        loop = asyncio.new_event_loop()
+        pending = set()
+        try:
+            pending = {loop.create_task(run(key, sql)) for key, sql in queries}
+            while pending:
+                done, pending = loop.run_until_complete(asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))
+                for task in done:
+                    yield task.result()
+        finally:
+            # The caller stopped early; cancel what is still being polled.
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+
+def group_by_query_tag(plan):
+    # Consecutive statements sharing a query tag, in plan order.
+    groups = []
+    for statement in plan:
+        if groups and groups[-1][0] == statement.query_tag:
+            groups[-1][1].append(statement)
+        else:
+            groups.append((statement.query_tag, [statement]))
+    return groups
+
+
+class AsyncGrantExecutor:
+    """Runs grant plans as async queries on a few pooled sessions.
+
+    Drop-in replacement for GrantExecutor. Partitions of the plan are coroutines sharing
+    the sessions, and a partition submits its next multi-statement request once the
+    previous one has finished, so revokes still run before the grants of an object. The
+    query tag is session state, so it is set on every session before the statements of
+    a tag are submitted.
+    """
+
+    def __init__(self, pool, batch_size=DEFAULT_BATCH_SIZE, retry=None, limiter=None, sessions=DEFAULT_SESSIONS,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.sessions = max(1, sessions)
+        self.engine = AsyncQueryEngine(retry, limiter, max_in_flight)
+
+    async def _execute_statements(self, conn, statements, snapshot):
+        sql = ";\n".join(statement.sql for statement in statements) + ";"
+        description = statements[0].target if len(statements) == 1 else f"batch of {len(statements)} statements"
+        try:
+            with timed_call("execution.async_batch"):
+                await self.engine.run(conn, sql, len(statements) if len(statements) > 1 else None,
+                                      description, fetch_results=False)
+        except Exception as e:
+            if len(statements) == 1:
+                count("statements.failed")
+                print(f"        Failed: {statements[0].sql}:", e)
+                return [(statements[0], False, e)]
+            count("execution.batches_split")
+            # Same as the synchronous executor: learn exactly which statements failed.
+            print(f"        Batch of {len(statements)} statements failed, retrying one by one:", e)
+            results = []
+            for statement in statements:
+                results.extend(await self._execute_statements(conn, [statement], snapshot))
+            return results
+        return record_success(statements, snapshot)
+
+    async def _execute_partition(self, conn, statements, snapshot):
+        results = []
+        for batch in chunk_statements(statements, self.batch_size):
+            results.extend(await self._execute_statements(conn, batch, snapshot))
+        return results
+
+    async def _execute(self, sessions, plan, snapshot):
+        results = []
+        for query_tag, statements in group_by_query_tag(plan):
+            for conn in sessions:
+                try:
+                    await asyncio.to_thread(set_query_tag, conn.cursor(), conn, query_tag, self.pool.session_tags)
+                except Exception as e:
+                    print(f"Error occurred while setting query tag {query_tag}:", e)
+            partitions = partition_plan(statements)
+            outcomes = await asyncio.gather(
+                *(self._execute_partition(sessions[i % len(sessions)], partition, snapshot)
+                  for i, partition in enumerate(partitions)),
+                return_exceptions=True)
+            for partition, outcome in zip(partitions, outcomes):
+                if isinstance(outcome, Exception):
+                    # One broken partition must not lose the results of the others.
+                    print("Error occurred while executing grant partition:", outcome)
+                    results.extend((statement, False, outcome) for statement in partition)
+                else:
+                    results.extend(outcome)
+        return results
+
+    def execute(self, plan, snapshot=None):
+        results = []
+        if plan:
+            try:
+                with self.pool.connections(self.sessions, reset_tag=False) as sessions:
+                    results = asyncio.run(self._execute(sessions, plan, snapshot))
+            except Exception as e:
+                print("Error occurred while executing grant plan:", e)
+                results = [(statement, False, e) for statement in plan]
+        print_plan_summary(results)
+        return results
+
+    def close(self):
+        self.pool.close_all()
@@ -0,0 +1,145 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import grant_permition_to_objects
+from drift_audit import AuditCheckpoint, run_drift_audit
+from fake_snowflake import FakeConnection, FakeSSMClient, generate_account, generate_configs
+from grant_executor import DEFAULT_BATCH_SIZE, ConnectionPool, GrantExecutor, summarize_results
+from grant_permition_to_objects import SSM_PARAMETERS, grant_access_main
+from show_metadata import INFORMATION_SCHEMA_METADATA, METADATA_BACKENDS
+
+
+# Offline throughput benchmark of the grant path against the in-memory account of
+# fake_snowflake, e.g.  python benchmark.py --databases 10 --schemas 500 --tables 1000
+
+
+@contextlib.contextmanager
+def quiet(verbose):
+    # The grant path prints its progress and run report; keep that out of the benchmark output.
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(name, account, fn, track_memory=True, verbose=False):
+    before = account.counters()
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with quiet(verbose):
+        results = fn()
+    wall_seconds = time.perf_counter() - started
+    peak_bytes = 0
+    if track_memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    after = account.counters()
+    phase = {"phase": name, "wall_seconds": round(wall_seconds, 3),
+             "peak_memory_mb": round(peak_bytes / 1024 / 1024, 1) if track_memory else None}
+    phase.update({key: after[key] - before[key] for key in after})
+    phase.update(summarize_results(results or []))
+    return phase
+
+
+def write_configs(directory, configs):
+    for file, config in configs.items():
+        with open(os.path.join(directory, file), 'w') as f:
+            json.dump(config, f)
+
+
+def run_benchmark(databases=2, schemas=20, tables=50, views=5, latency_ms=0.0, max_workers=8,
+                  batch_size=DEFAULT_BATCH_SIZE, track_memory=True, verbose=False, async_queries=False,
+                  metadata=INFORMATION_SCHEMA_METADATA, skip_inherited=False):
+    account = generate_account(databases, schemas, tables, views, latency_seconds=latency_ms / 1000)
+    configs = generate_configs(account)
+    ssm_client = FakeSSMClient({name: "benchmark" for name in SSM_PARAMETERS.values()})
+    directory = tempfile.mkdtemp(prefix="grant_benchmark_")
+    try:
+        write_configs(directory, configs)
+
+        def connect(sf_secret):
+            return FakeConnection(account)
+
+        def grant_run():
+            grant_permition_to_objects.clear_ssm_cache()
+            return grant_access_main(max_workers=max_workers, batch_size=batch_size,
+                                     watermark_file=os.path.join(directory, "watermarks.json"),
+                                     config_directory=directory, ssm_client=ssm_client, connect=connect,
+                                     async_queries=async_queries, metadata=metadata,
+                                     skip_inherited=skip_inherited)
+
+        def audit_run():
+            pool = ConnectionPool(lambda: FakeConnection(account), max_workers, grant_permition_to_objects.QUERY_TAG)
+            executor = GrantExecutor(pool, batch_size)
+            checkpoint = AuditCheckpoint(os.path.join(directory, "audit_checkpoint.json"), "benchmark", restart=True)
+            try:
+                run_drift_audit(FakeConnection(account), executor, grant_permition_to_objects.load_configs(directory),
+                                checkpoint, skip_inherited=skip_inherited)
+            finally:
+                executor.close()
+            return []
+
+        phases = [
+            # Everything is new and most grants are missing.
+            measure("first_run", account, grant_run, track_memory, verbose),
+            # The same objects are rediscovered through the watermark overlap; nothing is left to grant.
+            measure("repeat_run", account, grant_run, track_memory, verbose),
+            measure("drift_audit", account, audit_run, track_memory, verbose),
+        ]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "scale": {"databases": databases, "schemas_per_database": schemas, "tables_per_schema": tables,
+                  "views_per_schema": views, "latency_ms": latency_ms, "max_workers": max_workers,
+                  "batch_size": batch_size, "async_queries": async_queries,
+                  "metadata": metadata, "skip_inherited": skip_inherited},
+        "ssm_calls": ssm_client.calls,
+        "phases": phases,
+    }
+
+
+def print_report(report):
+    columns = ["phase", "wall_seconds", "round_trips", "statements", "grant_statements", "warehouse_queries",
+               "granted", "revoked", "failed", "peak_memory_mb"]
+    print(json.dumps(report["scale"]))
+    print("  ".join(f"{column:>16}" for column in columns))
+    for phase in report["phases"]:
+        print("  ".join(f"{str(phase[column]):>16}" for column in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the grant path against an in-memory Snowflake account.")
+    parser.add_argument("--databases", type=int, default=2)
+    parser.add_argument("--schemas", type=int, default=20, help="Schemas per database")
+    parser.add_argument("--tables", type=int, default=50, help="Tables per schema")
+    parser.add_argument("--views", type=int, default=5, help="Views per schema")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated latency of every round trip")
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--async-queries", action="store_true",
+                        help="Run the grant path with the execute_async engine")
+    parser.add_argument("--metadata", choices=METADATA_BACKENDS, default=INFORMATION_SCHEMA_METADATA,
+                        help="Metadata backend of the grant path")
+    parser.add_argument("--skip-inherited", action="store_true",
+                        help="Skip merge grants the roles already inherit")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc, which slows large runs down considerably")
+    parser.add_argument("--verbose", action="store_true", help="Keep the output of the grant path")
+    parser.add_argument("--output", default=None, help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+    report = run_benchmark(args.databases, args.schemas, args.tables, args.views, args.latency_ms,
+                           args.max_workers, args.batch_size, not args.no_memory, args.verbose, args.async_queries,
+                           args.metadata, args.skip_inherited)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
@@ -0,0 +1,164 @@
+import re
+
+
+# object_name/schema values starting with this prefix are regular expressions;
+# values containing * or ? are globs. Anything else is an exact name.
+REGEX_PREFIX = "re:"
+GLOB_CHARACTERS = ("*", "?")
+
+
+def is_pattern(value):
+    value = value or ""
+    return value.startswith(REGEX_PREFIX) or any(character in value for character in GLOB_CHARACTERS)
+
+
+def compile_pattern(value):
+    # A schema or object_name value as a regex fullmatched against that name alone, or
+    # None when the value is empty and any name matches.
+    if not value:
+        return None
+    if value.startswith(REGEX_PREFIX):
+        source = value[len(REGEX_PREFIX):]
+    else:
+        source = re.escape(value.upper()).replace("\\*", ".*").replace("\\?", ".")
+    try:
+        return re.compile(source, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern {value!r}: {e}") from None
+
+
+class PatternMatcher:
+    """The pattern blocks of one object type, keyed by database.
+
+    The schema and name of a block are compiled once and each is fullmatched against
+    that part of the object only, so anchors, groups and backreferences of a re: value
+    mean what they would for the name on its own. Blocks with the same database, schema
+    and name share their compiled patterns; the blocks of every matching pattern are
+    returned.
+    """
+
+    def __init__(self):
+        # {database: {(schema, name): (schema regex, name regex, [(position, item), ...])}}
+        self._patterns = {}
+
+    def add(self, database, schema, name, position, item):
+        patterns = self._patterns.setdefault(database, {})
+        if (schema, name) not in patterns:
+            patterns[(schema, name)] = (compile_pattern(schema), compile_pattern(name), [])
+        patterns[(schema, name)][2].append((position, item))
+
+    def match(self, database, schema, name):
+        blocks = []
+        for scope in {database, ""}:
+            for schema_regex, name_regex, items in self._patterns.get(scope, {}).values():
+                if schema_regex is not None and not schema_regex.fullmatch(schema):
+                    continue
+                if name_regex is not None and not name_regex.fullmatch(name):
+                    continue
+                blocks.extend(items)
+        return blocks
+
+
+class ConfigIndex:
+    """Config blocks compiled into hash indexes for O(1) matching of discovered objects.
+
+    Object-wise blocks (tables/views with an object_name, schemas with a schema,
+    databases with a database) are keyed by (object_type, database, schema, name).
+    Default blocks are keyed by (object_type, database, schema). A block that does
+    not name its database or schema is stored under "" and matches any of them.
+
+    Blocks whose object_name or schema is a glob or regex are compiled into one
+    PatternMatcher per object type. Their matches are combined with the exact blocks
+    of every scope, in config order. An invalid regex raises ValueError here rather
+    than leaving every object unmatched.
+    """
+
+    def __init__(self, config):
+        self._object_blocks = {}
+        self._default_blocks = {}
+        self._object_patterns = {}
+        self._default_patterns = {}
+        for position, item in enumerate(config):
+            object_type = item.get("object_type", "").upper()
+            database = item.get("database", "").upper()
+            schema = item.get("schema", "").upper()
+            object_name = item.get("object_name", "").upper()
+            # The raw values are checked: the re: prefix is lower case.
+            if object_type in ("TABLE", "VIEW", "SCHEMA") and (is_pattern(item.get("schema"))
+                                                               or is_pattern(item.get("object_name"))):
+                self._add_pattern(item, position, object_type, database)
+            elif object_type in ("TABLE", "VIEW"):
+                if object_name:
+                    self._add(self._object_blocks, (object_type, database, schema, object_name), position, item)
+                else:
+                    self._add(self._default_blocks, (object_type, database, schema), position, item)
+            elif object_type == "SCHEMA":
+                if schema:
+                    self._add(self._object_blocks, (object_type, database, "", schema), position, item)
+                elif not object_name:
+                    self._add(self._default_blocks, (object_type, database, ""), position, item)
+            elif object_type == "DATABASE":
+                if database:
+                    self._add(self._object_blocks, (object_type, "", "", database), position, item)
+                elif not object_name:
+                    self._add(self._default_blocks, (object_type, "", ""), position, item)
+
+    def _add_pattern(self, item, position, object_type, database):
+        # Patterns keep their original case so regexes such as \d are not altered.
+        schema = item.get("schema", "")
+        object_name = item.get("object_name", "")
+        if object_type == "SCHEMA":
+            if object_name:
+                return
+            self._object_patterns.setdefault(object_type, PatternMatcher()).add(database, "", schema, position, item)
+        elif object_name:
+            self._object_patterns.setdefault(object_type, PatternMatcher()).add(database, schema, object_name, position, item)
+        else:
+            self._default_patterns.setdefault(object_type, PatternMatcher()).add(database, schema, "", position, item)
+
+    @staticmethod
+    def _add(index, key, position, item):
+        index.setdefault(key, []).append((position, item))
+
+    @staticmethod
+    def _scopes(obj):
+        # (database, schema) keys an object can be matched under, most specific first.
+        database = (obj.database or "").upper()
+        schema = (obj.schema or "").upper()
+        if obj.object_type == "DATABASE":
+            return [("", "")]
+        if obj.object_type == "SCHEMA":
+            return [(database, ""), ("", "")]
+        return [(database, schema), (database, ""), ("", schema), ("", "")]
+
+    @staticmethod
+    def _collect(index, keys, pattern_blocks=()):
+        blocks = list(pattern_blocks)
+        for key in keys:
+            blocks.extend(index.get(key, ()))
+        return [item for _, item in sorted(blocks, key=lambda block: block[0])]
+
+    @staticmethod
+    def _pattern_blocks(patterns, obj, name):
+        matcher = patterns.get(obj.object_type.upper())
+        if matcher is None:
+            return []
+        database = (obj.database or "").upper()
+        schema = "" if obj.object_type == "SCHEMA" else (obj.schema or "").upper()
+        return matcher.match(database, schema, name)
+
+    def object_blocks(self, obj):
+        object_type = obj.object_type.upper()
+        name = obj.name.upper()
+        return self._collect(self._object_blocks,
+                             [(object_type, database, schema, name) for database, schema in self._scopes(obj)],
+                             self._pattern_blocks(self._object_patterns, obj, name))
+
+    def default_blocks(self, obj):
+        object_type = obj.object_type.upper()
+        return self._collect(self._default_blocks,
+                             [(object_type, database, schema) for database, schema in self._scopes(obj)],
+                             self._pattern_blocks(self._default_patterns, obj, ""))
+
+    def matches(self, obj):
+        return bool(self.object_blocks(obj))
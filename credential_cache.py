@@ -0,0 +1,71 @@
+import json
+import os
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+    InvalidToken = Exception
+
+
+# The local cache is only used when both a key (a Fernet key, see
+# Fernet.generate_key()) and a file path are configured.
+CACHE_KEY_ENV = "GRANT_ACCESS_CACHE_KEY"
+CACHE_FILE_ENV = "GRANT_ACCESS_CACHE_FILE"
+CACHE_TTL_ENV = "GRANT_ACCESS_CACHE_TTL"
+DEFAULT_CACHE_TTL_SECONDS = 300
+
+
+class EncryptedFileCache:
+    """Short-lived, Fernet-encrypted JSON cache file for the SSM parameters."""
+
+    def __init__(self, file_path, key, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS):
+        self.file_path = file_path
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key)
+
+    @classmethod
+    def from_environment(cls):
+        key = os.environ.get(CACHE_KEY_ENV)
+        file_path = os.environ.get(CACHE_FILE_ENV)
+        if not key or not file_path:
+            return None
+        if Fernet is None:
+            print("cryptography is not installed, the local credential cache is disabled")
+            return None
+        ttl_seconds = int(os.environ.get(CACHE_TTL_ENV, DEFAULT_CACHE_TTL_SECONDS))
+        return cls(file_path, key.encode(), ttl_seconds)
+
+    def read(self):
+        try:
+            with open(self.file_path, 'rb') as f:
+                payload = self._fernet.decrypt(f.read(), ttl=self.ttl_seconds)
+            return json.loads(payload)
+        except FileNotFoundError:
+            return None
+        except InvalidToken:
+            # Expired or written with another key.
+            return None
+        except Exception as e:
+            print(f"Error occurred while reading credential cache {self.file_path}:", e)
+            return None
+
+    def write(self, values):
+        try:
+            token = self._fernet.encrypt(json.dumps(values).encode())
+            temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(token)
+            os.replace(temp_path, self.file_path)
+        except Exception as e:
+            print(f"Error occurred while writing credential cache {self.file_path}:", e)
+
+    def clear(self):
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error occurred while removing credential cache {self.file_path}:", e)
+
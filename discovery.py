@@ -0,0 +1,298 @@
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from discovery_watermark import DEFAULT_LOOKBACK_MINUTES
+from run_report import count, timed_call
+
+
+# The object name comes first so discovered rows can still be read as obj[0].
+DiscoveredObject = namedtuple("DiscoveredObject", ["name", "created", "database", "schema", "object_type"])
+
+DISCOVERY_QUERIES = {
+    "TABLE": """
+        SELECT 'TABLE', TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, CREATED
+        FROM {database}.INFORMATION_SCHEMA.TABLES
+        WHERE {created_filter} AND TABLE_TYPE = 'BASE TABLE'""",
+    "VIEW": """
+        SELECT 'VIEW', TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, CREATED
+        FROM {database}.INFORMATION_SCHEMA.VIEWS
+        WHERE {created_filter}""",
+    "SCHEMA": """
+        SELECT 'SCHEMA', CATALOG_NAME, SCHEMA_NAME, SCHEMA_NAME, CREATED
+        FROM {database}.INFORMATION_SCHEMA.SCHEMATA
+        WHERE {created_filter}""",
+    "DATABASE": """
+        SELECT 'DATABASE', DATABASE_NAME, NULL, DATABASE_NAME, CREATED
+        FROM {information_schema}.DATABASES
+        WHERE {created_filter}""",
+}
+
+DEFAULT_CREATED_FILTER = f"CREATED >= DATEADD(MINUTES, -{DEFAULT_LOOKBACK_MINUTES}, CURRENT_TIMESTAMP())"
+# Rows pulled per fetchmany call, and batches buffered between discovery and grant workers.
+DEFAULT_FETCH_SIZE = 1000
+DEFAULT_MAX_PENDING_BATCHES = 4
+
+
+# Filters selecting every existing object of one audit partition, whatever its age.
+# A schema partition holds its tables and views; a database partition ("" schema)
+# holds the database itself and its schemas.
+PARTITION_FILTERS = {
+    "TABLE": "TABLE_SCHEMA = '{schema}'",
+    "VIEW": "TABLE_SCHEMA = '{schema}'",
+    "SCHEMA": "SCHEMA_NAME <> 'INFORMATION_SCHEMA'",
+    "DATABASE": "DATABASE_NAME = '{database}'",
+}
+
+
+def partition_object_types(schema, object_types):
+    partition_types = ("TABLE", "VIEW") if schema else ("SCHEMA", "DATABASE")
+    return sorted({object_type.upper() for object_type in object_types} & set(partition_types))
+
+
+def build_partition_query(database, schema, object_types):
+    selects = []
+    for object_type in partition_object_types(schema, object_types):
+        selects.append(DISCOVERY_QUERIES[object_type].format(
+            database=database,
+            information_schema=f"{database}.INFORMATION_SCHEMA",
+            created_filter=PARTITION_FILTERS[object_type].format(database=database, schema=schema),
+        ))
+    return "\n        UNION ALL".join(selects)
+
+
+def list_schemas(connection, database):
+    # None when the schemas could not be listed, so callers can tell it from an empty database.
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT SCHEMA_NAME
+            FROM {database}.INFORMATION_SCHEMA.SCHEMATA
+            WHERE SCHEMA_NAME <> 'INFORMATION_SCHEMA'
+        """)
+        return sorted(row[0].upper() for row in cursor.fetchall())
+    except Exception as e:
+        print(f"Error occurred while listing schemas of {database}:", e)
+        return None
+
+
+def build_discovery_query(database, object_types, watermarks=None):
+    selects = []
+    for object_type in sorted({object_type.upper() for object_type in object_types}):
+        if object_type not in DISCOVERY_QUERIES:
+            print(f"Object Type Is Not Valid: {object_type}")
+            continue
+        if object_type != "DATABASE" and not database:
+            print(f"Database not found in config, skipping {object_type} discovery")
+            continue
+        watermark_database = None if object_type == "DATABASE" else database
+        if watermarks is not None:
+            created_filter = watermarks.created_filter(watermark_database, object_type)
+        else:
+            created_filter = DEFAULT_CREATED_FILTER
+        selects.append(DISCOVERY_QUERIES[object_type].format(
+            database=database,
+            information_schema=f"{database}.INFORMATION_SCHEMA" if database else "INFORMATION_SCHEMA",
+            created_filter=created_filter,
+        ))
+    if not selects:
+        return ""
+    # Oldest first: when fetching stops midway, the mark observed so far only covers
+    # rows that were fetched, and the rest are discovered again by the next run.
+    return "\n        UNION ALL".join(selects) + "\n        ORDER BY CREATED"
+
+
+def iter_object_batches(connection, query, database, watermarks=None, fetch_size=DEFAULT_FETCH_SIZE,
+                        raise_errors=False):
+    """Run an object query and yield its rows as lists of at most `fetch_size` objects.
+
+    Rows are pulled with fetchmany, so memory stays bounded however many objects match.
+    A failed query or fetch ends the batches early, or is raised with `raise_errors`.
+    """
+    try:
+        cursor = connection.cursor()
+        with timed_call("discovery.query"):
+            cursor.execute(query)
+        count("discovery.queries")
+    except Exception as e:
+        print(f"Error occurred while discovering objects in {database}:", e)
+        if raise_errors:
+            raise
+        return
+    yield from iter_fetched_batches(cursor, database, watermarks, fetch_size, raise_errors)
+
+
+def iter_fetched_batches(cursor, database, watermarks=None, fetch_size=DEFAULT_FETCH_SIZE, raise_errors=False):
+    # Rows of an object query that has already run on the cursor.
+    while True:
+        try:
+            with timed_call("discovery.fetch"):
+                rows = cursor.fetchmany(fetch_size)
+        except Exception as e:
+            print(f"Error occurred while fetching objects in {database}:", e)
+            if raise_errors:
+                raise
+            return
+        if not rows:
+            return
+        count("discovery.objects", len(rows))
+        batch = []
+        for object_type, catalog, schema, object_name, created in rows:
+            batch.append(DiscoveredObject(object_name, created, catalog, schema, object_type))
+            if watermarks is not None:
+                watermarks.observe(None if object_type == "DATABASE" else database, object_type, created)
+        yield batch
+
+
+def iter_discovered_batches(connection, database, object_types, watermarks=None, fetch_size=DEFAULT_FETCH_SIZE):
+    # New objects of every requested type, in fetchmany batches.
+    query = build_discovery_query(database, object_types, watermarks)
+    if not query:
+        return
+    yield from iter_object_batches(connection, query, database, watermarks, fetch_size)
+
+
+SYSTEM_DATABASES = {"SNOWFLAKE", "SNOWFLAKE_SAMPLE_DATA"}
+
+
+def get_account_databases(connection):
+    # Local databases of the account; shared and system databases cannot take these grants.
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SHOW DATABASES")
+        columns = [column[0].lower() for column in cursor.description]
+        rows = cursor.fetchall()
+    except Exception as e:
+        print("Error occurred while listing account databases:", e)
+        return []
+
+    name_index = columns.index("name")
+    origin_index = columns.index("origin") if "origin" in columns else None
+    databases = []
+    for row in rows:
+        name = row[name_index].upper()
+        if name in SYSTEM_DATABASES or (origin_index is not None and row[origin_index]):
+            continue
+        databases.append(name)
+    return databases
+
+
+def resolve_scope_databases(connection, configs):
+    """Databases referenced by the config blocks, or every account database when a
+    table/view/schema block does not name one."""
+    databases = set()
+    unscoped = False
+    for config in configs:
+        for item in config:
+            if item.get("object_type") == "DATABASE":
+                continue
+            if item.get("database"):
+                databases.add(item["database"].upper())
+            else:
+                unscoped = True
+    if unscoped:
+        databases.update(get_account_databases(connection))
+    return sorted(databases)
+
+
+class DiscoveryStream:
+    """Discovery of every database in scope as one stream of object batches.
+
+    New databases are discovered once for the account on the caller's connection.
+    The other object types are discovered with one query per database, fanned out
+    over the connection pool, and handed over through a bounded queue, so grants
+    for the first batches run while later ones are still being fetched. At least
+    one pooled connection is left free for the grant work consuming the stream.
+    With an AsyncQueryEngine the queries are instead all submitted asynchronously
+    on the caller's connection.
+    """
+
+    def __init__(self, object_types, watermarks=None, fetch_size=DEFAULT_FETCH_SIZE,
+                 max_pending_batches=DEFAULT_MAX_PENDING_BATCHES):
+        self.object_types = sorted({object_type.upper() for object_type in object_types})
+        self.watermarks = watermarks
+        self.fetch_size = fetch_size
+        self.max_pending_batches = max_pending_batches
+
+    def batches(self, connection, pool, databases, engine=None):
+        databases = sorted({database.upper() for database in databases if database})
+        if engine is not None:
+            yield from self._stream_async(engine, connection, databases)
+            return
+        if "DATABASE" in self.object_types:
+            account_database = databases[0] if databases else None
+            yield from self.discover(connection, account_database, ["DATABASE"])
+
+        object_types = [object_type for object_type in self.object_types if object_type != "DATABASE"]
+        if not object_types or not databases:
+            return
+        workers = min(len(databases), pool.size - 1)
+        if workers < 1:
+            for database in databases:
+                yield from self.discover(connection, database, object_types)
+            return
+        yield from self._stream(pool, databases, object_types, workers)
+
+    def discover(self, connection, database, object_types):
+        # Batches of the new objects of one database.
+        return iter_discovered_batches(connection, database, object_types, self.watermarks, self.fetch_size)
+
+    def _stream_async(self, engine, connection, databases):
+        # Every discovery query is submitted at once on the caller's connection, and the
+        # results are streamed in the order the queries finish.
+        queries = []
+        if "DATABASE" in self.object_types:
+            account_database = databases[0] if databases else None
+            queries.append((account_database, build_discovery_query(account_database, ["DATABASE"], self.watermarks)))
+        object_types = [object_type for object_type in self.object_types if object_type != "DATABASE"]
+        if object_types:
+            for database in databases:
+                queries.append((database, build_discovery_query(database, object_types, self.watermarks)))
+        queries = [(database, query) for database, query in queries if query]
+        count("discovery.queries", len(queries))
+        for database, cursor, error in engine.iter_completed(connection, queries, "discovery"):
+            if error is not None:
+                print(f"Error occurred while discovering objects in {database}:", error)
+                continue
+            yield from iter_fetched_batches(cursor, database, self.watermarks, self.fetch_size)
+
+    def _stream(self, pool, databases, object_types, workers):
+        pending = queue.Queue(maxsize=self.max_pending_batches)
+        stopped = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    pending.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce(database):
+            try:
+                with pool.connection() as conn:
+                    for batch in self.discover(conn, database, object_types):
+                        put(batch)
+                        if stopped.is_set():
+                            return
+            except Exception as e:
+                print(f"Error occurred while discovering recently created objects in {database}:", e)
+            finally:
+                put(done)
+
+        with ThreadPoolExecutor(max_workers=workers) as producers:
+            for database in databases:
+                producers.submit(produce, database)
+            try:
+                remaining = len(databases)
+                while remaining:
+                    item = pending.get()
+                    if item is done:
+                        remaining -= 1
+                    else:
+                        yield item
+            finally:
+                # The consumer stopped early; let blocked producers exit.
+                stopped.set()
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+
+# Objects created slightly before the last mark are scanned again, so objects whose
+# CREATED timestamp lands late in INFORMATION_SCHEMA are not missed.
+DEFAULT_OVERLAP_MINUTES = 2
+# Lookback used the first time a database/object type is scanned.
+DEFAULT_LOOKBACK_MINUTES = 5
+
+
+class WatermarkStore:
+    """High-water marks of the last processed CREATED timestamp per database and object type.
+
+    Marks observed during a run are kept pending and only written to the state file by
+    `commit`, once the run has processed them. Objects whose grants failed are held, so
+    the committed mark stays at or before them and the next run discovers them again.
+    A read-only store never writes, e.g. for a dry run whose objects still have to be
+    granted by a later run.
+    """
+
+    def __init__(self, file_path, overlap_minutes=DEFAULT_OVERLAP_MINUTES, read_only=False):
+        self.file_path = file_path
+        self.read_only = read_only
+        self.overlap = timedelta(minutes=overlap_minutes)
+        self._marks = {}
+        self._pending = {}
+        # {key: CREATED of the oldest object the run has to retry}.
+        self._held = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def _key(database, object_type):
+        return f"{(database or 'ACCOUNT').upper()}|{object_type.upper()}"
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r') as f:
+                self._marks = {key: datetime.fromisoformat(value) for key, value in json.load(f).items()}
+        except Exception as e:
+            print(f"Error occurred while reading watermark file {self.file_path}:", e)
+            self._marks = {}
+
+    def since(self, database, object_type):
+        mark = self._marks.get(self._key(database, object_type))
+        if mark is None:
+            return None
+        return mark - self.overlap
+
+    def created_filter(self, database, object_type):
+        since = self.since(database, object_type)
+        if since is None:
+            return f"CREATED >= DATEADD(MINUTES, -{DEFAULT_LOOKBACK_MINUTES}, CURRENT_TIMESTAMP())"
+        return f"CREATED >= '{since.isoformat()}'::TIMESTAMP_LTZ"
+
+    def observe(self, database, object_type, created):
+        if created is None:
+            return
+        key = self._key(database, object_type)
+        with self._lock:
+            current = self._pending.get(key) or self._marks.get(key)
+            if current is None or created > current:
+                self._pending[key] = created
+
+    def hold(self, database, object_type, created):
+        if created is None:
+            return
+        key = self._key(database, object_type)
+        with self._lock:
+            current = self._held.get(key)
+            if current is None or created < current:
+                self._held[key] = created
+
+    def discard(self):
+        # Forget the marks of a run that failed before committing; the next run starts
+        # again from the committed ones.
+        with self._lock:
+            self._pending = {}
+            self._held = {}
+
+    def commit(self):
+        if self.read_only:
+            return
+        with self._lock:
+            self._marks.update(self._pending)
+            for key, created in self._held.items():
+                if key in self._marks and created < self._marks[key]:
+                    self._marks[key] = created
+            self._pending = {}
+            self._held = {}
+            marks = {key: value.isoformat() for key, value in self._marks.items()}
+        try:
+            temp_path = f"{self.file_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(marks, f, indent=4, sort_keys=True)
+            os.replace(temp_path, self.file_path)
+        except Exception as e:
+            print(f"Error occurred while writing watermark file {self.file_path}:", e)
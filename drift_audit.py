@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+
+from config_index import ConfigIndex
+from discovery import (DEFAULT_FETCH_SIZE, build_partition_query, iter_object_batches, list_schemas,
+                       partition_object_types, resolve_scope_databases)
+from grant_cache import DEFAULT_GRANT_CACHE_TTL_SECONDS, config_fingerprint, open_grant_cache
+from grant_executor import DEFAULT_BATCH_SIZE, ConnectionPool, GrantExecutor, map_with_connections
+from grant_permition_to_objects import (CONFIG_DIRECTORY, FILE_LIST, OBJECT_TYPE_KEYS, QUERY_TAG, apply_config_to_batch,
+                                        connect_snowflake, extract_unique_object_types, get_object_specific_schemas,
+                                        get_snowflake_info, load_configs)
+from main import get_max_workers
+from privilege_snapshot import PrivilegeSnapshot
+from role_hierarchy import RoleGraph
+from show_metadata import config_roles, split_name
+
+
+AUDIT_CHECKPOINT_FILE = 'audit_checkpoint.json'
+
+
+def partition_label(partition):
+    database, schema = partition
+    return f"{database}.{schema}" if schema else database
+
+
+class AuditCheckpoint:
+    """Completed audit partitions, persisted after each one so an audit can be resumed.
+
+    A checkpoint written for other config files, or for an audit that ran to the
+    end, is ignored and the next audit starts over.
+    """
+
+    def __init__(self, file_path, fingerprint, restart=False):
+        self.file_path = file_path
+        self.fingerprint = fingerprint
+        self._done = {}
+        self._lock = threading.Lock()
+        if not restart:
+            self.load()
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"Error occurred while reading audit checkpoint {self.file_path}:", e)
+            return
+        if state.get("fingerprint") != self.fingerprint:
+            print("Config files changed since the last audit, starting over")
+        elif state.get("complete"):
+            print("Last audit completed, starting over")
+        else:
+            self._done = state.get("partitions", {})
+            print(f"Resuming audit, {len(self._done)} partitions already done")
+
+    def is_done(self, partition):
+        return partition_label(partition) in self._done
+
+    def mark_done(self, partition, summary):
+        with self._lock:
+            self._done[partition_label(partition)] = summary
+            self._write(complete=False)
+
+    def finish(self):
+        with self._lock:
+            self._write(complete=True)
+
+    def summary(self):
+        with self._lock:
+            totals = {"partitions": len(self._done), "objects": 0, "drift": 0, "failed": 0}
+            for partition in self._done.values():
+                for key in ("objects", "drift", "failed"):
+                    totals[key] += partition.get(key, 0)
+            return totals
+
+    def _write(self, complete):
+        state = {"fingerprint": self.fingerprint, "complete": complete, "partitions": self._done}
+        try:
+            temp_path = f"{self.file_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(state, f, indent=4, sort_keys=True)
+            os.replace(temp_path, self.file_path)
+        except Exception as e:
+            print(f"Error occurred while writing audit checkpoint {self.file_path}:", e)
+
+
+class DriftRecorder:
+    """Stands in for the GrantExecutor of one partition and records the drift it is asked to fix.
+
+    With an executor the statements are also executed; without one the audit only reports them.
+    """
+
+    def __init__(self, pool, label, executor=None):
+        self.pool = pool
+        self.label = label
+        self.executor = executor
+        self.statements = []
+
+    def execute(self, plan, snapshot=None):
+        self.statements.extend(plan)
+        for statement in plan:
+            print(f"    Drift in {self.label}: {statement.sql}")
+        if self.executor is None:
+            return []
+        return self.executor.execute(plan, snapshot)
+
+
+def audit_partition(conn, pool, executor, configs, indexes, object_specific_schemas, partition,
+                    fix=False, fetch_size=DEFAULT_FETCH_SIZE, cache=None, role_graph=None):
+    database, schema = partition
+    object_types = {object_type for config in configs.values() for object_type in extract_unique_object_types(config)}
+    query = build_partition_query(database, schema, object_types)
+    snapshot = PrivilegeSnapshot()
+    snapshot.role_graph = role_graph
+    with pool.connection() as partition_conn:
+        # The grants of this partition only, so memory is bounded by the largest schema.
+        # A failure is raised, so the partition is not checkpointed as done with no objects.
+        if not snapshot.load(partition_conn, database, [schema] if schema else []):
+            raise RuntimeError(f"privileges of {partition_label(partition)} could not be loaded")
+        batches = list(iter_object_batches(partition_conn, query, database, fetch_size=fetch_size,
+                                           raise_errors=True)) if query else []
+
+    # The pooled connection is released before granting, so the executor can use it.
+    recorder = DriftRecorder(pool, partition_label(partition), executor if fix else None)
+    counts = {file: {obj_type: [0, 0] for obj_type in OBJECT_TYPE_KEYS} for file in FILE_LIST}
+    results = []
+    objects = sum(len(batch) for batch in batches)
+    for batch in batches:
+        if cache is not None:
+            batch = cache.unknown(batch)
+        batch_results = []
+        for file in FILE_LIST:
+            batch_results.extend(apply_config_to_batch(file, configs[file], indexes[file], batch, conn, snapshot,
+                                                       recorder, object_specific_schemas, counts[file]))
+        if cache is not None:
+            # Reported but unfixed drift keeps its objects out of the cache.
+            cache.record_results(batch_results)
+            cache.mark_reconciled(batch, [statement for statement, ok, _ in batch_results if not ok]
+                                  if fix else recorder.statements)
+        results.extend(batch_results)
+    return {
+        "objects": objects,
+        "drift": len(recorder.statements),
+        "failed": sum(1 for _, ok, _ in results if not ok),
+    }
+
+
+def list_partitions(conn, pool, configs):
+    """Partitions in scope, and the databases whose schemas could not be listed."""
+    databases = resolve_scope_databases(conn, configs.values())
+    object_types = {object_type for config in configs.values() for object_type in extract_unique_object_types(config)}
+    partitions = []
+    unlisted = []
+    if partition_object_types("", object_types):
+        partitions.extend((database, "") for database in databases)
+    if partition_object_types("*", object_types):
+        for database, schemas in zip(databases, map_with_connections(pool, databases, list_schemas)):
+            if schemas is None:
+                unlisted.append(database)
+                continue
+            partitions.extend((database, schema) for schema in schemas)
+    return partitions, unlisted
+
+
+def run_drift_audit(conn, executor, configs, checkpoint, fix=False, fetch_size=DEFAULT_FETCH_SIZE, cache=None,
+                    skip_inherited=False):
+    """Compare every object in scope with the config files, one database/schema partition at a time.
+
+    Partitions run concurrently on the executor's pool and each finished partition is
+    checkpointed. With `fix` the drift is granted/revoked, otherwise it is only reported.
+    Objects the grant cache knows to be compliant are skipped. With `skip_inherited`,
+    merge privileges a role inherits through a granted role are not reported as drift.
+    """
+    pool = executor.pool
+    role_graph = RoleGraph.load(conn, config_roles(configs.values()), pool) if skip_inherited else None
+    indexes = {file: ConfigIndex(configs[file]) for file in FILE_LIST}
+    object_specific_schemas = get_object_specific_schemas(configs["object_vise_permission.json"])
+
+    partitions, unlisted = list_partitions(conn, pool, configs)
+    pending = [partition for partition in partitions if not checkpoint.is_done(partition)]
+    print(f"Auditing {len(pending)} of {len(partitions)} partitions")
+
+    def run(partition):
+        summary = audit_partition(conn, pool, executor, configs, indexes, object_specific_schemas,
+                                  partition, fix, fetch_size, cache, role_graph)
+        checkpoint.mark_done(partition, summary)
+        return partition, summary
+
+    # The schema partitions of an unlisted database were never audited.
+    failed_partitions = len(unlisted)
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(pending)) or 1) as workers:
+        futures = [workers.submit(run, partition) for partition in pending]
+        for future in as_completed(futures):
+            try:
+                partition, summary = future.result()
+                print(f"Audited {partition_label(partition)}: {summary['objects']} objects, {summary['drift']} drift")
+            except Exception as e:
+                failed_partitions += 1
+                print("Error occurred while auditing partition:", e)
+
+    # Partitions that failed stay pending, so the next run picks them up again.
+    if not failed_partitions:
+        checkpoint.finish()
+    totals = checkpoint.summary()
+    print(f"Audit finished: {totals['partitions']} partitions, {totals['objects']} objects, "
+          f"{totals['drift']} drift statements, {totals['failed']} failed, {failed_partitions} partitions failed")
+    return totals
+
+
+def audit_main(fix=False, max_workers=None, batch_size=DEFAULT_BATCH_SIZE, checkpoint_file=None, restart=False,
+               grant_cache_file=None, grant_cache_ttl=DEFAULT_GRANT_CACHE_TTL_SECONDS, skip_inherited=False):
+    conn = {}
+    executor = None
+    cache = None
+    try:
+        sf_secret = get_snowflake_info(boto3.session.Session().client('ssm', region_name='us-east-1'))
+        conn = connect_snowflake(sf_secret)
+        pool = ConnectionPool(lambda: connect_snowflake(sf_secret), max_workers or get_max_workers(), QUERY_TAG)
+        executor = GrantExecutor(pool, batch_size)
+
+        configs = load_configs()
+        checkpoint = AuditCheckpoint(checkpoint_file or os.path.join(CONFIG_DIRECTORY, AUDIT_CHECKPOINT_FILE),
+                                     config_fingerprint(configs), restart)
+        cache = open_grant_cache(grant_cache_file, configs, grant_cache_ttl)
+        run_drift_audit(conn, executor, configs, checkpoint, fix, cache=cache, skip_inherited=skip_inherited)
+    except Exception as e:
+        print("Error occurred in audit:", e)
+    finally:
+        if cache:
+            cache.close()
+        if executor:
+            executor.close()
+        if conn:
+            conn.close()
+
+
+def object_parts(object_type, name):
+    # (database, schema, object name) of DB, DB.SCHEMA or DB.SCHEMA.OBJECT.
+    parts = [part.upper() for part in split_name(name)]
+    if object_type == "DATABASE":
+        return parts[0], None, parts[0]
+    if object_type == "SCHEMA":
+        return parts[0], parts[1], parts[1]
+    return parts[0], parts[1], parts[2]
+
+
+def print_effective_access(graph, object_type, name, privilege):
+    database, schema, object_name = object_parts(object_type, name)
+    roles = graph.roles_with_privilege(object_type, database, schema, object_name, privilege)
+    print(f"{privilege.upper()} on {object_type} {name.upper()}: {len(roles)} roles")
+    for role, source in roles.items():
+        print(f"    {role}" if role == source else f"    {role} (inherited from {source})")
+    return roles
+
+
+def effective_access_main(object_type, name, privilege, max_workers=None):
+    """Report which roles can use a privilege on an object, directly or through granted roles.
+
+    The graph is built from the configured roles, the roles they inherit and the roles
+    inheriting them.
+    """
+    conn = {}
+    pool = None
+    try:
+        sf_secret = get_snowflake_info(boto3.session.Session().client('ssm', region_name='us-east-1'))
+        conn = connect_snowflake(sf_secret)
+        pool = ConnectionPool(lambda: connect_snowflake(sf_secret), max_workers or get_max_workers(), QUERY_TAG)
+        graph = RoleGraph.load(conn, config_roles(load_configs().values()), pool, ancestors=True)
+        return print_effective_access(graph, object_type.upper(), name, privilege)
+    except Exception as e:
+        print("Error occurred while checking effective access:", e)
+        return {}
+    finally:
+        if pool:
+            pool.close_all()
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit the privileges of every object in scope against the configs.")
+    parser.add_argument("--fix", action="store_true",
+                        help="Grant/revoke the drift instead of only reporting it")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Number of concurrent Snowflake connections (defaults to the CPU count)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Grant statements sent per round trip")
+    parser.add_argument("--checkpoint-file", default=None,
+                        help="File recording the finished partitions of an interrupted audit")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint and audit every partition again")
+    parser.add_argument("--grant-cache", default=None,
+                        help="SQLite file remembering reconciled objects, so they are skipped until they expire")
+    parser.add_argument("--grant-cache-ttl", type=int, default=DEFAULT_GRANT_CACHE_TTL_SECONDS,
+                        help="Seconds a reconciled object is trusted before it is checked again")
+    parser.add_argument("--skip-inherited", action="store_true",
+                        help="Do not report merge privileges a role inherits through a granted role as drift")
+    parser.add_argument("--effective-access", nargs=3, metavar=("OBJECT_TYPE", "NAME", "PRIVILEGE"), default=None,
+                        help="Only list the roles that can use PRIVILEGE on the object, e.g. TABLE DB.SCHEMA.T SELECT")
+    args = parser.parse_args()
+    if args.effective_access:
+        effective_access_main(*args.effective_access, max_workers=args.max_workers)
+    else:
+        audit_main(args.fix, args.max_workers, args.batch_size, args.checkpoint_file, args.restart,
+                   args.grant_cache, args.grant_cache_ttl, args.skip_inherited)
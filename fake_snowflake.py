@@ -0,0 +1,489 @@
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# In-memory stand-in for the Snowflake account and the SSM parameters, so the grant path
+# can run and be benchmarked offline. Only the statements issued by this tool are modelled.
+
+PLURAL_TYPES = {"TABLES": "TABLE", "VIEWS": "VIEW", "SCHEMAS": "SCHEMA"}
+INFORMATION_SCHEMA_VIEWS = {"TABLES": "TABLE", "VIEWS": "VIEW", "SCHEMATA": "SCHEMA", "DATABASES": "DATABASE"}
+
+GRANT_PATTERN = re.compile(r"^(GRANT|REVOKE) (.+?) ON (.+) (?:TO|FROM) ROLE (\S+)$", re.IGNORECASE)
+BULK_TARGET_PATTERN = re.compile(r"^(ALL|FUTURE) (TABLES|VIEWS|SCHEMAS) IN (SCHEMA|DATABASE) (\S+)$", re.IGNORECASE)
+SEGMENT_PATTERN = re.compile(r"SELECT '(\w+)'.*? FROM (?:(\w+)\.)?INFORMATION_SCHEMA\.(\w+) WHERE (.*)$")
+LOOKBACK_PATTERN = re.compile(r"CREATED >= DATEADD\(MINUTES, -(\d+), CURRENT_TIMESTAMP\(\)\)")
+SINCE_PATTERN = re.compile(r"CREATED >= '([^']+)'::TIMESTAMP_LTZ")
+EQUALS_PATTERN = re.compile(r"(TABLE_SCHEMA|DATABASE_NAME) = '([^']*)'")
+PRIVILEGES_PATTERN = re.compile(r"FROM (\w+)\.INFORMATION_SCHEMA\.OBJECT_PRIVILEGES(?: WHERE (.*))?$")
+SHOW_FUTURE_PATTERN = re.compile(r"^SHOW FUTURE GRANTS IN (SCHEMA|DATABASE) (\S+)$", re.IGNORECASE)
+SHOW_OBJECTS_PATTERN = re.compile(r"^SHOW TERSE (TABLES|VIEWS|SCHEMAS|DATABASES)(?: IN (SCHEMA|DATABASE) (\S+))?"
+                                  r"(?: LIMIT (\d+)(?: FROM '([^']*)')?)?$", re.IGNORECASE)
+SHOW_GRANTS_TO_PATTERN = re.compile(r"^SHOW GRANTS TO ROLE (\S+)$", re.IGNORECASE)
+SHOW_GRANTS_OF_PATTERN = re.compile(r"^SHOW GRANTS OF ROLE (\S+)$", re.IGNORECASE)
+SHOW_OBJECT_COLUMNS = ["created_on", "name", "kind", "database_name", "schema_name"]
+SHOW_GRANT_COLUMNS = ["created_on", "privilege", "granted_on", "name", "granted_to", "grantee_name"]
+SHOW_ROLE_HOLDER_COLUMNS = ["created_on", "role", "granted_to", "grantee_name"]
+PRIVILEGE_COLUMNS = ["OBJECT_CATALOG", "OBJECT_SCHEMA", "OBJECT_NAME", "OBJECT_TYPE", "GRANTEE", "PRIVILEGE_TYPE"]
+# Rows per Arrow batch handed out by fetch_arrow_batches.
+ARROW_BATCH_ROWS = 10000
+
+
+class FakeAccount:
+    """Databases, schemas, objects and grants of a simulated account.
+
+    `latency_seconds` is slept on every round trip. The counters record the round trips,
+    the SQL statements they carried, how many of those were GRANT/REVOKE statements and
+    how many were SELECTs that would have needed a running warehouse. Async queries run at submission and report their result once the latency has passed.
+    """
+
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        # {database: {"created": datetime, "schemas": {schema: {"created": datetime, "objects": {(type, name): created}}}}}
+        self.databases = {}
+        # {database: {(object_type, schema, object_name): {grantee: {privilege, ...}}}}
+        self.grants = {}
+        # {(database, schema): {(object_type, grantee): {privilege, ...}}}
+        self.future_grants = {}
+        # {role: {role granted to it, ...}}
+        self.role_grants = {}
+        self.round_trips = 0
+        self.statements = 0
+        self.grant_statements = 0
+        self.status_checks = 0
+        self.warehouse_queries = 0
+        # {query_id: (ready_at, result, error)} of the async queries.
+        self.queries = {}
+        self._lock = threading.Lock()
+
+    def add_database(self, database, created):
+        self.databases.setdefault(database, {"created": created, "schemas": {}})
+        self.grants.setdefault(database, {})
+
+    def add_schema(self, database, schema, created):
+        self.databases[database]["schemas"].setdefault(schema, {"created": created, "objects": {}})
+
+    def add_object(self, object_type, database, schema, name, created):
+        self.databases[database]["schemas"][schema]["objects"][(object_type, name)] = created
+
+    def grant(self, object_type, database, schema, name, grantee, privilege):
+        key = self._grant_key(object_type, schema, name)
+        with self._lock:
+            self.grants[database].setdefault(key, {}).setdefault(grantee, set()).add(privilege)
+
+    def grant_role(self, role, to_role):
+        with self._lock:
+            self.role_grants.setdefault(to_role, set()).add(role)
+
+    def counters(self):
+        return {"round_trips": self.round_trips, "statements": self.statements,
+                "grant_statements": self.grant_statements, "status_checks": self.status_checks,
+                "warehouse_queries": self.warehouse_queries}
+
+    @staticmethod
+    def _grant_key(object_type, schema, name):
+        if object_type == "DATABASE":
+            return (object_type, "", name)
+        if object_type == "SCHEMA":
+            return (object_type, name, name)
+        return (object_type, schema, name)
+
+    # Queries
+
+    def execute(self, sql, num_statements=1, wait=True):
+        if self.latency_seconds and wait:
+            time.sleep(self.latency_seconds)
+        statements = [statement.strip() for statement in sql.split(";") if statement.strip()]
+        with self._lock:
+            self.round_trips += 1
+            self.statements += len(statements)
+        result = ([], None)
+        for statement in statements:
+            result = self._execute_one(" ".join(statement.split()))
+        return result
+
+    def submit(self, sql, num_statements=1):
+        result, error = None, None
+        try:
+            result = self.execute(sql, num_statements, wait=False)
+        except Exception as e:
+            error = e
+        with self._lock:
+            query_id = f"fake-query-{len(self.queries) + self.round_trips}"
+            self.queries[query_id] = (time.monotonic() + self.latency_seconds, result, error)
+        return query_id
+
+    def query_status(self, query_id):
+        with self._lock:
+            self.status_checks += 1
+            ready_at, _, error = self.queries[query_id]
+        if time.monotonic() < ready_at:
+            return "RUNNING"
+        if error is not None:
+            raise error
+        return "SUCCESS"
+
+    def query_result(self, query_id):
+        with self._lock:
+            return self.queries.pop(query_id)[1]
+
+    def _execute_one(self, sql):
+        upper = sql.upper()
+        if upper.startswith(("GRANT ", "REVOKE ")):
+            with self._lock:
+                self.grant_statements += 1
+            self._apply_grant(sql)
+            return [], None
+        if upper.startswith("ALTER SESSION"):
+            return [], None
+        if upper == "SHOW DATABASES":
+            return ([(self.databases[name]["created"], name, "", "STANDARD") for name in sorted(self.databases)],
+                    ["created_on", "name", "origin", "kind"])
+        match = SHOW_FUTURE_PATTERN.match(sql)
+        if match:
+            return self._future_grant_rows(match.group(1).upper(), match.group(2))
+        match = SHOW_OBJECTS_PATTERN.match(sql)
+        if match:
+            return self._show_object_rows(*match.groups()), SHOW_OBJECT_COLUMNS
+        match = SHOW_GRANTS_TO_PATTERN.match(sql)
+        if match:
+            return self._show_role_grant_rows(match.group(1).upper()), SHOW_GRANT_COLUMNS
+        match = SHOW_GRANTS_OF_PATTERN.match(sql)
+        if match:
+            role = match.group(1).upper()
+            with self._lock:
+                holders = sorted(holder for holder, roles in self.role_grants.items() if role in roles)
+            return [(None, role, "ROLE", holder) for holder in holders], SHOW_ROLE_HOLDER_COLUMNS
+        if upper.startswith("SELECT"):
+            with self._lock:
+                self.warehouse_queries += 1
+        if "OBJECT_PRIVILEGES" in upper:
+            return self._privilege_rows(sql), PRIVILEGE_COLUMNS
+        if upper.startswith("SELECT SCHEMA_NAME FROM"):
+            database = sql.split("FROM ")[1].split(".")[0]
+            return [(schema,) for schema in sorted(self.databases.get(database, {}).get("schemas", {}))], None
+        if upper.startswith("SELECT '"):
+            ordered = upper.endswith(" ORDER BY CREATED")
+            if ordered:
+                sql = sql[:-len(" ORDER BY CREATED")]
+            rows = []
+            for segment in sql.split(" UNION ALL "):
+                rows.extend(self._object_rows(segment.strip()))
+            if ordered:
+                rows.sort(key=lambda row: row[4])
+            return rows, None
+        raise ValueError(f"Statement not supported by the fake account: {sql[:200]}")
+
+    def _object_rows(self, segment):
+        match = SEGMENT_PATTERN.match(segment)
+        if not match:
+            raise ValueError(f"Query not supported by the fake account: {segment[:200]}")
+        object_type, database, view, condition = match.groups()
+        since = None
+        lookback = LOOKBACK_PATTERN.search(condition)
+        if lookback:
+            since = datetime.now(timezone.utc) - timedelta(minutes=int(lookback.group(1)))
+        watermark = SINCE_PATTERN.search(condition)
+        if watermark:
+            since = datetime.fromisoformat(watermark.group(1))
+        equals = dict(EQUALS_PATTERN.findall(condition))
+
+        def recent(created):
+            return since is None or created >= since
+
+        rows = []
+        if INFORMATION_SCHEMA_VIEWS[view] == "DATABASE":
+            for name, info in sorted(self.databases.items()):
+                if recent(info["created"]) and equals.get("DATABASE_NAME", name) == name:
+                    rows.append(("DATABASE", name, None, name, info["created"]))
+            return rows
+        schemas = self.databases.get(database, {}).get("schemas", {})
+        for schema, info in schemas.items():
+            if object_type == "SCHEMA":
+                if recent(info["created"]):
+                    rows.append(("SCHEMA", database, schema, schema, info["created"]))
+                continue
+            if equals.get("TABLE_SCHEMA", schema) != schema:
+                continue
+            for (candidate_type, name), created in info["objects"].items():
+                if candidate_type == object_type and recent(created):
+                    rows.append((object_type, database, schema, name, created))
+        return rows
+
+    def _show_object_rows(self, plural, container_type, path, limit, start):
+        rows = []
+        if plural.upper() == "DATABASES":
+            for name, info in sorted(self.databases.items()):
+                rows.append((info["created"], name, "STANDARD", None, None))
+        else:
+            parts = path.split(".")
+            database = self.databases.get(parts[0], {"schemas": {}})
+            for schema, info in sorted(database["schemas"].items()):
+                if container_type.upper() == "SCHEMA" and schema != parts[1]:
+                    continue
+                if plural.upper() == "SCHEMAS":
+                    rows.append((info["created"], schema, None, parts[0], None))
+                    continue
+                object_type = PLURAL_TYPES[plural.upper()]
+                for (candidate_type, name), created in sorted(info["objects"].items()):
+                    if candidate_type == object_type:
+                        rows.append((created, name, object_type, parts[0], schema))
+        if start:
+            rows = [row for row in rows if row[1] >= start]
+        return rows[:int(limit)] if limit else rows
+
+    def _show_role_grant_rows(self, role):
+        rows = []
+        with self._lock:
+            for database, objects in sorted(self.grants.items()):
+                for (object_type, schema, name), grantees in objects.items():
+                    if object_type == "DATABASE":
+                        path = database
+                    elif object_type == "SCHEMA":
+                        path = f"{database}.{schema}"
+                    else:
+                        path = f"{database}.{schema}.{name}"
+                    for privilege in sorted(grantees.get(role, ())):
+                        rows.append((None, privilege, object_type, path, "ROLE", role))
+            for child in sorted(self.role_grants.get(role, ())):
+                rows.append((None, "USAGE", "ROLE", child, "ROLE", role))
+        return rows
+
+    def _privilege_rows(self, sql):
+        match = PRIVILEGES_PATTERN.search(sql)
+        if not match:
+            return []
+        database, condition = match.groups()
+        if condition and "OBJECT_NAME" in condition:
+            # Single privilege checks of the legacy path are not modelled.
+            return []
+        schemas = set(re.findall(r"'([^']+)'", condition.split("OBJECT_SCHEMA IN")[1])) \
+            if condition and "OBJECT_SCHEMA IN" in condition else None
+        containers_only = bool(condition)
+        rows = []
+        with self._lock:
+            for (object_type, schema, name), grantees in self.grants.get(database, {}).items():
+                if containers_only and object_type not in ("DATABASE", "SCHEMA") \
+                        and (schemas is None or schema not in schemas):
+                    continue
+                for grantee, privileges in grantees.items():
+                    for privilege in privileges:
+                        rows.append((database, schema or None, name, object_type, grantee, privilege))
+        return rows
+
+    def _future_grant_rows(self, container_type, path):
+        parts = path.split(".")
+        key = (parts[0], parts[1] if container_type == "SCHEMA" else "")
+        rows = []
+        with self._lock:
+            for (object_type, grantee), privileges in self.future_grants.get(key, {}).items():
+                for privilege in privileges:
+                    rows.append((privilege, object_type, path, grantee, "ROLE"))
+        return rows, ["privilege", "grant_on", "name", "grantee_name", "grant_to"]
+
+    def _apply_grant(self, sql):
+        match = GRANT_PATTERN.match(sql)
+        if not match:
+            raise ValueError(f"Grant not supported by the fake account: {sql[:200]}")
+        action, privileges, target, grantee = match.groups()
+        privileges = [privilege.strip().upper() for privilege in privileges.split(",")]
+        grantee = grantee.upper()
+
+        bulk = BULK_TARGET_PATTERN.match(target)
+        if bulk:
+            scope, plural, container_type, path = bulk.groups()
+            object_type = PLURAL_TYPES[plural.upper()]
+            parts = path.split(".")
+            if scope.upper() == "FUTURE":
+                key = (parts[0], parts[1] if container_type.upper() == "SCHEMA" else "")
+                with self._lock:
+                    current = self.future_grants.setdefault(key, {}).setdefault((object_type, grantee), set())
+                    self._update(current, action, privileges)
+                return
+            objects = self.databases[parts[0]]["schemas"][parts[1]]["objects"]
+            targets = [(object_type, parts[0], parts[1], name) for candidate_type, name in objects
+                       if candidate_type == object_type]
+        else:
+            object_type, path = target.split(" ", 1)
+            parts = path.split(".")
+            object_type = object_type.upper()
+            if object_type == "DATABASE":
+                targets = [(object_type, parts[0], "", parts[0])]
+            elif object_type == "SCHEMA":
+                targets = [(object_type, parts[0], parts[1], parts[1])]
+            else:
+                targets = [(object_type, parts[0], parts[1], parts[2])]
+
+        with self._lock:
+            for object_type, database, schema, name in targets:
+                if database not in self.grants:
+                    raise ValueError(f"Database '{database}' does not exist or not authorized.")
+                grantees = self.grants[database].setdefault(self._grant_key(object_type, schema, name), {})
+                self._update(grantees.setdefault(grantee, set()), action, privileges)
+
+    @staticmethod
+    def _update(current, action, privileges):
+        if action.upper() == "GRANT":
+            current.update(privileges)
+        else:
+            current.difference_update(privileges)
+
+
+class FakeCursor:
+    def __init__(self, account):
+        self.account = account
+        self.description = None
+        self.sfqid = None
+        self._rows = []
+
+    def execute(self, sql, num_statements=1):
+        self._set_result(self.account.execute(sql, num_statements))
+        return self
+
+    def execute_async(self, sql, num_statements=1):
+        self.sfqid = self.account.submit(sql, num_statements)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, query_id):
+        self._set_result(self.account.query_result(query_id))
+
+    def _set_result(self, result):
+        rows, columns = result
+        self._rows = list(rows)
+        self.description = [(column,) for column in columns] if columns else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetch_arrow_batches(self):
+        # Like the connector, one pyarrow Table per result chunk; only used when pyarrow is
+        # installed, and only for the all-string OBJECT_PRIVILEGES results.
+        rows, self._rows = self._rows, []
+        columns = [column[0] for column in self.description or []]
+        for start in range(0, len(rows), ARROW_BATCH_ROWS):
+            chunk = rows[start:start + ARROW_BATCH_ROWS]
+            yield pa.table({name: pa.array(list(values), pa.string()) for name, values in zip(columns, zip(*chunk))})
+
+    def nextset(self):
+        return None
+
+
+class FakeConnection:
+    def __init__(self, account):
+        self.account = account
+        self._closed = False
+
+    def cursor(self):
+        return FakeCursor(self.account)
+
+    def is_closed(self):
+        return self._closed
+
+    def get_query_status_throw_if_error(self, query_id):
+        return self.account.query_status(query_id)
+
+    def is_still_running(self, status):
+        return status == "RUNNING"
+
+    def close(self):
+        self._closed = True
+
+
+class FakeSSMClient:
+    """Answers get_parameter/get_parameters from a dict and counts the calls."""
+
+    def __init__(self, values, latency_seconds=0.0):
+        self.values = dict(values)
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self._call()
+        return {"Parameter": {"Name": Name, "Value": self.values[Name]}}
+
+    def get_parameters(self, Names, WithDecryption=False):
+        self._call()
+        return {
+            "Parameters": [{"Name": name, "Value": self.values[name]} for name in Names if name in self.values],
+            "InvalidParameters": [name for name in Names if name not in self.values],
+        }
+
+
+def generate_account(databases=2, schemas=20, tables=50, views=5, grantees=("ANALYST", "DEVELOPER"),
+                     pre_granted=0.3, latency_seconds=0.0, seed=0):
+    """A synthetic account whose objects were all created a minute ago.
+
+    `pre_granted` is the share of tables that already hold the SELECT of the first
+    grantee, so plans mix missing and existing privileges. The first grantee is granted
+    to the last one, which therefore inherits those SELECTs.
+    """
+    generator = random.Random(seed)
+    account = FakeAccount(latency_seconds)
+    created = datetime.now(timezone.utc) - timedelta(minutes=1)
+    if len(grantees) > 1:
+        account.grant_role(grantees[0], grantees[-1])
+    for database_number in range(databases):
+        database = f"DB_{database_number:03d}"
+        account.add_database(database, created)
+        for schema_number in range(schemas):
+            schema = f"SCHEMA_{schema_number:04d}"
+            account.add_schema(database, schema, created)
+            for table_number in range(tables):
+                name = f"TABLE_{table_number:05d}"
+                account.add_object("TABLE", database, schema, name, created)
+                if generator.random() < pre_granted:
+                    account.grant("TABLE", database, schema, name, grantees[0], "SELECT")
+            for view_number in range(views):
+                account.add_object("VIEW", database, schema, f"VIEW_{view_number:05d}", created)
+    return account
+
+
+def generate_configs(account, grantees=("ANALYST", "DEVELOPER"), object_wise_share=0.01, seed=0):
+    """Default blocks for every database plus object-wise blocks for a share of the tables.
+
+    Each database also has an anchored regex block for its first three views, so runs
+    cover the pattern matching too. The object-wise blocks merge; an enforce block would revoke the default grants the
+    default file hands to the same table on every run.
+    """
+    generator = random.Random(seed)
+    reader, writer = grantees[0], grantees[-1]
+    default_config = [{
+        "object_type": "DATABASE",
+        "enforcement_action": "merge",
+        "grantee": [{reader: ["USAGE"]}, {writer: ["USAGE", "CREATE SCHEMA"]}],
+    }]
+    object_config = []
+    for database, info in sorted(account.databases.items()):
+        default_config.append({"object_type": "SCHEMA", "database": database, "enforcement_action": "merge",
+                               "grantee": [{reader: ["USAGE"]}, {writer: ["USAGE", "CREATE TABLE"]}]})
+        default_config.append({"object_type": "TABLE", "database": database, "enforcement_action": "merge",
+                               "grantee": [{reader: ["SELECT"]}, {writer: ["SELECT", "INSERT", "UPDATE"]}]})
+        default_config.append({"object_type": "VIEW", "database": database, "enforcement_action": "merge",
+                               "grantee": [{reader: ["SELECT"]}]})
+        object_config.append({"object_type": "VIEW", "database": database, "object_name": "re:^VIEW_0000[0-2]$",
+                              "enforcement_action": "merge", "grantee": [{writer: ["SELECT"]}]})
+        for schema, schema_info in sorted(info["schemas"].items()):
+            for object_type, name in sorted(schema_info["objects"]):
+                if object_type == "TABLE" and generator.random() < object_wise_share:
+                    object_config.append({
+                        "object_type": "TABLE", "database": database, "schema": schema, "object_name": name,
+                        "enforcement_action": "merge", "grantee": [{writer: ["SELECT", "DELETE"]}],
+                    })
+    return {"default_permission.json": default_config, "object_vise_permission.json": object_config}
@@ -0,0 +1,108 @@
+from config_index import is_pattern
+from grant_executor import map_with_connections
+from grant_plan import PROTECTED_PRIVILEGES, GrantStatement, config_grants
+
+
+# Object types that can take GRANT ... ON FUTURE <objects> IN SCHEMA/DATABASE.
+FUTURE_OBJECT_TYPES = ("TABLE", "VIEW", "SCHEMA")
+
+
+def future_containers(config, databases):
+    """Map every default block to the schema or database its future grants live in.
+
+    Returns {(database, schema): [(object_type, item), ...]}; schema is "" for
+    database-level future grants. Unscoped blocks are expanded to every database in scope.
+    Snowflake ignores the database-level future grants of an object type in a schema that
+    has schema-level future grants of that type, so such schemas also take the database
+    blocks of that type.
+    """
+    containers = {}
+    for item in config:
+        object_type = item.get("object_type", "").upper()
+        if object_type not in FUTURE_OBJECT_TYPES or item.get("object_name"):
+            continue
+        schema = item.get("schema", "").upper()
+        if is_pattern(item.get("schema")):
+            print(f"Skipping future grants for {object_type} block with schema pattern {item.get('schema')}")
+            continue
+        if object_type == "SCHEMA":
+            schema = ""
+        block_databases = [item["database"].upper()] if item.get("database") else databases
+        for database in block_databases:
+            containers.setdefault((database, schema), []).append((object_type, item))
+
+    for (database, schema), blocks in containers.items():
+        if not schema:
+            continue
+        schema_types = {object_type for object_type, _ in blocks}
+        for object_type, item in containers.get((database, ""), []):
+            if object_type in schema_types and (object_type, item) not in blocks:
+                blocks.append((object_type, item))
+    return containers
+
+
+def load_future_grants(connection, container):
+    """Current future grants of one container as {(object_type, grantee): {privilege, ...}}."""
+    database, schema = container
+    target = f"SCHEMA {database}.{schema}" if schema else f"DATABASE {database}"
+    current = {}
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SHOW FUTURE GRANTS IN {target}")
+        columns = [column[0].lower() for column in cursor.description]
+        rows = cursor.fetchall()
+    except Exception as e:
+        print(f"Error occurred while loading future grants in {target}:", e)
+        return None
+
+    for row in rows:
+        grant = dict(zip(columns, row))
+        if (grant.get("grant_to") or "ROLE").upper() != "ROLE":
+            continue
+        key = (grant["grant_on"].upper(), grant["grantee_name"].upper())
+        current.setdefault(key, set()).add(grant["privilege"].upper())
+    return current
+
+
+def build_future_grant_plan(containers, current_by_container):
+    plan = []
+    for container, blocks in containers.items():
+        current = current_by_container.get(container)
+        if current is None:
+            continue
+        database, schema = container
+        # An enforce block only revokes what no block of the container grants the role.
+        wanted = {}
+        for object_type, item in blocks:
+            for grantee, privileges in config_grants(item).items():
+                wanted.setdefault((object_type, grantee), set()).update(privileges)
+        for object_type, item in blocks:
+            query_tag = f"future_{item.get('enforcement_action', 'merge')}_{object_type.lower()}"
+            for grantee, privileges in config_grants(item).items():
+                existing = current.get((object_type, grantee), set())
+                if item.get("enforcement_action") == "enforce":
+                    extra = sorted(existing - wanted[(object_type, grantee)] - PROTECTED_PRIVILEGES)
+                    if extra:
+                        plan.append(GrantStatement("REVOKE", tuple(extra), object_type, database, schema,
+                                                   "", grantee, query_tag, scope="FUTURE"))
+                missing = tuple(privilege for privilege in privileges if privilege not in existing)
+                if missing:
+                    plan.append(GrantStatement("GRANT", missing, object_type, database, schema,
+                                               "", grantee, query_tag, scope="FUTURE"))
+    return plan
+
+
+def sync_future_grants(executor, config, databases):
+    """Keep ON FUTURE grants in line with the default blocks of `config`."""
+    containers = future_containers(config, databases)
+    if not containers:
+        print("No default blocks to turn into future grants")
+        return []
+    keys = sorted(containers)
+    current = map_with_connections(executor.pool, keys, load_future_grants)
+    plan = build_future_grant_plan(containers, dict(zip(keys, current)))
+    if not plan:
+        print(f"    Future grants already in place for {len(keys)} schemas/databases")
+        return []
+    print(f"    Executing {len(plan)} future grant statements for {len(keys)} schemas/databases")
+    return executor.execute(plan)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from privilege_snapshot import object_key
+
+
+# Reconciled objects are trusted for a day before they are checked against Snowflake again.
+DEFAULT_GRANT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS reconciled_objects (
+        catalog TEXT NOT NULL,
+        schema_name TEXT NOT NULL,
+        object_name TEXT NOT NULL,
+        object_type TEXT NOT NULL,
+        config_hash TEXT NOT NULL,
+        reconciled_at REAL NOT NULL,
+        PRIMARY KEY (object_type, catalog, schema_name, object_name)
+    );
+    CREATE INDEX IF NOT EXISTS reconciled_objects_reconciled_at ON reconciled_objects (reconciled_at);
+    CREATE TABLE IF NOT EXISTS applied_grants (
+        catalog TEXT NOT NULL,
+        schema_name TEXT NOT NULL,
+        object_name TEXT NOT NULL,
+        object_type TEXT NOT NULL,
+        grantee TEXT NOT NULL,
+        privilege TEXT NOT NULL,
+        action TEXT NOT NULL,
+        applied_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS applied_grants_object ON applied_grants (catalog, schema_name, object_name);
+    CREATE INDEX IF NOT EXISTS applied_grants_grantee ON applied_grants (grantee);
+    CREATE INDEX IF NOT EXISTS applied_grants_applied_at ON applied_grants (applied_at);
+"""
+
+
+def config_fingerprint(configs):
+    return hashlib.sha256(json.dumps(configs, sort_keys=True).encode()).hexdigest()
+
+
+def discovered_key(obj):
+    return (obj.object_type.upper(),) + object_key(obj.object_type, obj.database, obj.schema, obj.name)
+
+
+def statement_keys(statement):
+    # Objects touched by a grant statement; FUTURE grants touch no existing object.
+    if statement.scope == "FUTURE":
+        return []
+    object_names = statement.objects if statement.scope == "ALL" else (statement.object_name,)
+    return [(statement.object_type,) + object_key(statement.object_type, statement.database, statement.schema, name)
+            for name in object_names]
+
+
+class GrantCache:
+    """Local SQLite record of the objects already reconciled and the grants applied to them.
+
+    An object is only trusted while its entry is younger than `ttl_seconds` and was
+    written for the current config hash; older entries are evicted when the cache opens.
+    """
+
+    def __init__(self, file_path, config_hash, ttl_seconds=DEFAULT_GRANT_CACHE_TTL_SECONDS):
+        self.file_path = file_path
+        self.config_hash = config_hash
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(file_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA_SQL)
+        self.evict()
+
+    def evict(self):
+        expired_before = time.time() - self.ttl_seconds
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM reconciled_objects WHERE config_hash <> ? OR reconciled_at < ?",
+                             (self.config_hash, expired_before))
+            self._db.execute("DELETE FROM applied_grants WHERE applied_at < ?", (expired_before,))
+
+    def unknown(self, objects):
+        """The objects not known to be compliant with the current config."""
+        if not objects:
+            return []
+        expired_before = time.time() - self.ttl_seconds
+        keys = {discovered_key(obj) for obj in objects}
+        with self._lock:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS lookup "
+                             "(object_type TEXT, catalog TEXT, schema_name TEXT, object_name TEXT)")
+            self._db.execute("DELETE FROM lookup")
+            self._db.executemany("INSERT INTO lookup VALUES (?, ?, ?, ?)", keys)
+            known = set(self._db.execute("""
+                SELECT lookup.object_type, lookup.catalog, lookup.schema_name, lookup.object_name
+                FROM lookup
+                JOIN reconciled_objects USING (object_type, catalog, schema_name, object_name)
+                WHERE config_hash = ? AND reconciled_at >= ?
+            """, (self.config_hash, expired_before)).fetchall())
+        return [obj for obj in objects if discovered_key(obj) not in known]
+
+    def mark_reconciled(self, objects, pending_statements=()):
+        """Record the objects as compliant, except those touched by a statement not applied."""
+        pending = {key for statement in pending_statements for key in statement_keys(statement)}
+        now = time.time()
+        rows = [key + (self.config_hash, now) for key in {discovered_key(obj) for obj in objects}
+                if key not in pending]
+        with self._lock, self._db:
+            self._db.executemany("""
+                INSERT OR REPLACE INTO reconciled_objects
+                    (object_type, catalog, schema_name, object_name, config_hash, reconciled_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def record_results(self, results):
+        now = time.time()
+        rows = [(catalog, schema, object_name, object_type, statement.grantee, privilege, statement.action, now)
+                for statement, ok, _ in results if ok
+                for object_type, catalog, schema, object_name in statement_keys(statement)
+                for privilege in statement.privileges]
+        with self._lock, self._db:
+            self._db.executemany("""
+                INSERT INTO applied_grants
+                    (catalog, schema_name, object_name, object_type, grantee, privilege, action, applied_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_grant_cache(file_path, configs, ttl_seconds=DEFAULT_GRANT_CACHE_TTL_SECONDS):
+    if not file_path:
+        return None
+    try:
+        return GrantCache(file_path, config_fingerprint(configs), ttl_seconds)
+    except Exception as e:
+        print(f"Error occurred while opening grant cache {file_path}, running without it:", e)
+        return None
@@ -0,0 +1,72 @@
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+from privilege_snapshot import GRANT_COLUMNS, object_key
+from run_report import count
+
+
+OBJECT_COLUMNS = ["CATALOG", "SCHEMA", "OBJECT", "GRANTEE"]
+
+
+def desired_grants_table(targets):
+    """The config expanded into one row per (target, grantee, privilege)."""
+    columns = {name: [] for name in ["TARGET"] + GRANT_COLUMNS}
+    for position, target in enumerate(targets):
+        catalog, schema, object_name = object_key(target["object_type"], target["database"],
+                                                  target["schema"], target["object_name"])
+        for grantee, privileges in target["grants"].items():
+            for privilege in privileges:
+                columns["TARGET"].append(position)
+                columns["CATALOG"].append(catalog)
+                columns["SCHEMA"].append(schema)
+                columns["OBJECT"].append(object_name)
+                columns["GRANTEE"].append(grantee)
+                columns["PRIVILEGE"].append(privilege)
+    return pa.table({name: pa.array(values, pa.int64() if name == "TARGET" else pa.string())
+                     for name, values in columns.items()})
+
+
+def diff_targets(targets, snapshot):
+    """Missing and extra privileges of every target, from anti-joins of desired against actual grants.
+
+    Returns one {grantee: (extra, missing)} dict per target, or None when pyarrow is not
+    installed or a catalog is not Arrow-backed. Arrow-backed catalogs are diffed here
+    however small the plan, e.g. one discovery batch: the dict lookups would first copy
+    the whole catalog into Python. Only the schemas of the targets are joined.
+    `extra` holds every privilege a configured grantee has beyond the config; it is only
+    computed for enforce targets.
+    """
+    if pa is None or not targets:
+        return None
+    schemas = {}
+    for target in targets:
+        catalog, schema, _ = object_key(target["object_type"], target["database"], target["schema"],
+                                        target["object_name"])
+        schemas.setdefault(catalog, set()).add(schema)
+    actual_tables = [snapshot.grants_table(catalog, schemas[catalog]) for catalog in sorted(schemas)]
+    if any(table is None for table in actual_tables):
+        return None
+    count("planning.arrow_diffs")
+
+    actual = pa.concat_tables(actual_tables)
+    desired = desired_grants_table(targets)
+    diffs = [{} for _ in targets]
+
+    missing = desired.join(actual, keys=GRANT_COLUMNS, join_type="left anti")
+    for row in missing.select(["TARGET", "GRANTEE", "PRIVILEGE"]).to_pylist():
+        diffs[row["TARGET"]].setdefault(row["GRANTEE"], (set(), set()))[1].add(row["PRIVILEGE"])
+
+    enforced = [position for position, target in enumerate(targets) if target["enforcement_action"] == "enforce"]
+    if enforced:
+        keys = (desired.filter(pc.is_in(desired["TARGET"], value_set=pa.array(enforced, pa.int64())))
+                .select(["TARGET"] + OBJECT_COLUMNS)
+                .group_by(["TARGET"] + OBJECT_COLUMNS).aggregate([]))
+        held = actual.join(keys, keys=OBJECT_COLUMNS, join_type="inner")
+        extra = held.join(desired, keys=["TARGET"] + GRANT_COLUMNS, join_type="left anti")
+        for row in extra.select(["TARGET", "GRANTEE", "PRIVILEGE"]).to_pylist():
+            diffs[row["TARGET"]].setdefault(row["GRANTEE"], (set(), set()))[0].add(row["PRIVILEGE"])
+    return diffs
@@ -0,0 +1,278 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from grant_plan import apply_to_snapshot
+from run_report import count, timed_call
+from throttling import AdaptiveLimiter, RetryPolicy
+
+# Statements per multi-statement request; 1 sends every statement on its own.
+DEFAULT_BATCH_SIZE = 50
+
+
+def is_connection_closed(conn):
+    try:
+        return conn.is_closed()
+    except AttributeError:
+        return False
+    except Exception:
+        return True
+
+
+class ConnectionPool:
+    """Bounded pool of Snowflake connections shared by the executor workers.
+
+    Connections are opened lazily through `connect` and reused until `close_all`.
+    Sessions are opened with `query_tag`; the grant phases switch it, so every other
+    checkout sets it back before the session is handed out.
+    """
+
+    def __init__(self, connect, size, query_tag=None):
+        self.size = max(1, size)
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+        self._available = threading.BoundedSemaphore(self.size)
+        # Query tag currently set on each pooled session, keyed by id(conn).
+        self.session_tags = {}
+        self.query_tag = query_tag
+
+    @contextmanager
+    def connection(self, blocking=True, reset_tag=True):
+        # Without blocking, None is yielded when every connection is in use. The grant
+        # executors pass reset_tag=False as they set the tag of each phase themselves.
+        if not self._available.acquire(blocking):
+            yield None
+            return
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self._connect()
+                with self._lock:
+                    self._opened.append(conn)
+            try:
+                if reset_tag:
+                    self._reset_tag(conn)
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._available.release()
+
+    @contextmanager
+    def connections(self, count, reset_tag=True):
+        """Check out up to `count` connections: the first one waits, the others are taken only if free."""
+        with ExitStack() as stack:
+            conns = [stack.enter_context(self.connection(reset_tag=reset_tag))]
+            while len(conns) < count:
+                conn = stack.enter_context(self.connection(blocking=False, reset_tag=reset_tag))
+                if conn is None:
+                    break
+                conns.append(conn)
+            yield conns
+
+    def _reset_tag(self, conn):
+        # A session never tagged by a grant phase still has the tag it was opened with.
+        if self.session_tags.get(id(conn)) in (None, self.query_tag):
+            return
+        try:
+            set_query_tag(conn.cursor(), conn, self.query_tag, self.session_tags)
+        except Exception as e:
+            print(f"Error occurred while resetting query tag {self.query_tag}:", e)
+
+    def _take_idle(self):
+        # Idle sessions can expire between runs of a long-lived process; drop closed ones.
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if not is_connection_closed(conn):
+                return conn
+            with self._lock:
+                if conn in self._opened:
+                    self._opened.remove(conn)
+            self.session_tags.pop(id(conn), None)
+
+    def close_all(self):
+        with self._lock:
+            opened, self._opened = self._opened, []
+        self._idle = queue.LifoQueue()
+        self.session_tags = {}
+        for conn in opened:
+            try:
+                conn.close()
+            except Exception as e:
+                print("Error occurred while closing pooled connection:", e)
+
+
+def map_with_connections(pool, items, fn):
+    """Run fn(conn, item) for every item concurrently, each call on a pooled connection."""
+    items = list(items)
+
+    def run(item):
+        with pool.connection() as conn:
+            return fn(conn, item)
+
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(items)) or 1) as executor:
+        return list(executor.map(run, items))
+
+
+def set_query_tag(cursor, conn, query_tag, session_tags):
+    # Only switch the session's query tag when the phase changes.
+    if not query_tag or session_tags.get(id(conn)) == query_tag:
+        return
+    cursor.execute(f"alter session set query_tag='{query_tag}';")
+    session_tags[id(conn)] = query_tag
+
+
+def execute_statement(cursor, statement, snapshot=None, retry=None, limiter=None):
+    retry = retry or RetryPolicy()
+    try:
+        with timed_call("execution.statement"):
+            retry.call(lambda: cursor.execute(statement.sql), limiter, statement.target)
+        return record_success([statement], snapshot)[0]
+    except Exception as e:
+        count("statements.failed")
+        print(f"        Failed: {statement.sql}:", e)
+        return statement, False, e
+
+
+def record_success(statements, snapshot=None):
+    count("statements.succeeded", len(statements))
+    results = []
+    for statement in statements:
+        apply_to_snapshot(snapshot, statement)
+        logging.debug(f"        {statement.sql}")
+        results.append((statement, True, None))
+    return results
+
+
+def chunk_statements(statements, batch_size):
+    # Consecutive statements of the same phase are sent together, at most batch_size at a time.
+    batch = []
+    for statement in statements:
+        if batch and (len(batch) >= batch_size or batch[0].query_tag != statement.query_tag):
+            yield batch
+            batch = []
+        batch.append(statement)
+    if batch:
+        yield batch
+
+
+def execute_batch(cursor, statements, snapshot=None, retry=None, limiter=None):
+    retry = retry or RetryPolicy()
+    sql = ";\n".join(statement.sql for statement in statements) + ";"
+
+    def run():
+        cursor.execute(sql, num_statements=len(statements))
+        while cursor.nextset():
+            pass
+
+    try:
+        with timed_call("execution.batch"):
+            retry.call(run, limiter, f"batch of {len(statements)} statements")
+    except Exception as e:
+        count("execution.batches_split")
+        # The batch stops at the first failing statement. GRANT and REVOKE are idempotent,
+        # so rerun it one statement at a time to learn exactly which statements failed.
+        print(f"        Batch of {len(statements)} statements failed, retrying one by one:", e)
+        return [execute_statement(cursor, statement, snapshot, retry, limiter) for statement in statements]
+    return record_success(statements, snapshot)
+
+
+def execute_statements(conn, statements, snapshot=None, session_tags=None, batch_size=1, retry=None, limiter=None):
+    session_tags = {} if session_tags is None else session_tags
+    retry = retry or RetryPolicy()
+    cursor = conn.cursor()
+    results = []
+    for batch in chunk_statements(statements, max(1, batch_size)):
+        try:
+            retry.call(lambda: set_query_tag(cursor, conn, batch[0].query_tag, session_tags),
+                       description=f"query tag {batch[0].query_tag}")
+        except Exception as e:
+            print(f"Error occurred while setting query tag {batch[0].query_tag}:", e)
+        if len(batch) == 1:
+            results.append(execute_statement(cursor, batch[0], snapshot, retry, limiter))
+        else:
+            results.extend(execute_batch(cursor, batch, snapshot, retry, limiter))
+    return results
+
+
+def execute_grant_plan(conn, plan, snapshot=None, batch_size=1):
+    results = execute_statements(conn, plan, snapshot, batch_size=batch_size)
+    print_plan_summary(results)
+    return results
+
+
+def partition_plan(plan):
+    # Statements of one database/schema stay together and keep their planned order,
+    # so the revokes of an object still run before its grants.
+    partitions = {}
+    for statement in plan:
+        partitions.setdefault((statement.database, statement.schema), []).append(statement)
+    return list(partitions.values())
+
+
+class GrantExecutor:
+    """Runs grant plans over a ConnectionPool.
+
+    Partitions of the plan run concurrently, and the statements of a partition are
+    submitted as multi-statement requests of up to `batch_size` statements. Requests
+    are retried with backoff on transient errors, and the number in flight follows an
+    AIMD limit that backs off when Snowflake throttles.
+    """
+
+    def __init__(self, pool, batch_size=DEFAULT_BATCH_SIZE, retry=None, limiter=None):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.retry = retry or RetryPolicy()
+        self.limiter = limiter or AdaptiveLimiter(pool.size)
+
+    def _execute_partition(self, statements, snapshot):
+        try:
+            with self.pool.connection(reset_tag=False) as conn:
+                return execute_statements(conn, statements, snapshot, self.pool.session_tags, self.batch_size,
+                                          self.retry, self.limiter)
+        except Exception as e:
+            print("Error occurred while opening pooled connection:", e)
+            return [(statement, False, e) for statement in statements]
+
+    def execute(self, plan, snapshot=None):
+        partitions = partition_plan(plan)
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.pool.size, len(partitions)) or 1) as executor:
+            futures = [executor.submit(self._execute_partition, statements, snapshot) for statements in partitions]
+            for future, statements in zip(futures, partitions):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    # One broken partition must not lose the results of the others.
+                    print("Error occurred while executing grant partition:", e)
+                    results.extend((statement, False, e) for statement in statements)
+        print_plan_summary(results)
+        return results
+
+    def close(self):
+        self.pool.close_all()
+
+
+def summarize_results(results):
+    return {
+        "granted": sum(1 for statement, ok, _ in results if ok and statement.action == "GRANT"),
+        "revoked": sum(1 for statement, ok, _ in results if ok and statement.action == "REVOKE"),
+        "failed": sum(1 for _, ok, _ in results if not ok),
+    }
+
+
+def print_plan_summary(results):
+    summary = summarize_results(results)
+    print(f"    Plan executed: {summary['granted']} granted, {summary['revoked']} revoked, {summary['failed']} failed")
+
+
+def print_results_summary(results):
+    summary = summarize_results(results)
+    print(f"Run finished: {summary['granted']} granted, {summary['revoked']} revoked, {summary['failed']} failed")
@@ -1,31 +1,83 @@
 import os
+import argparse
 import snowflake.connector
 import json
 import logging
 import boto3
-
-
-def get_snowflake_info(ssm_client):
-    session = boto3.session.Session()
-    ssm_client = session.client('ssm', region_name='us-east-1')
-    env_param = ssm_client.get_parameter(Name='env', WithDecryption=True)
-    env = env_param.get('Parameter').get('Value')
+from async_executor import AsyncGrantExecutor
+from credential_cache import EncryptedFileCache
+from privilege_snapshot import PrivilegeSnapshot
+from grant_plan import build_grant_plan, grant_target
+from grant_executor import (DEFAULT_BATCH_SIZE, ConnectionPool, GrantExecutor, execute_grant_plan,
+                            map_with_connections, print_results_summary)
+from config_index import ConfigIndex, is_pattern
+from discovery import resolve_scope_databases
+from discovery_watermark import WatermarkStore
+from future_grants import sync_future_grants
+from grant_cache import DEFAULT_GRANT_CACHE_TTL_SECONDS, discovered_key, open_grant_cache, statement_keys
+from main import get_max_workers
+from role_hierarchy import RoleGraph
+from run_report import count, phase, profiled, start_run_report
+from show_metadata import (INFORMATION_SCHEMA_METADATA, METADATA_BACKENDS, config_roles, create_discovery_stream,
+                           create_snapshot)
+
+# Session-level tag for discovery and snapshot queries; grant statements switch it per phase.
+QUERY_TAG = 'grant_access'
+WATERMARK_FILE = 'discovery_watermarks.json'
+FILE_LIST = ["default_permission.json", "object_vise_permission.json"]
+CONFIG_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
+
+
+SSM_PARAMETERS = {
+    'env': 'env',
+    'snf_account': '/users/snowflake/account',
+    'snf_user': '/users/snowflake/account/user',
+    'snf_key': '/users/snowflake/account/password',
+}
+
+# SSM values loaded by this process, reused by later calls (e.g. warm Lambda invocations).
+_ssm_cache = {}
+
+
+def get_ssm_parameters(ssm_client):
+    if _ssm_cache:
+        return dict(_ssm_cache)
+
+    file_cache = EncryptedFileCache.from_environment()
+    values = file_cache.read() if file_cache else None
+    if not values:
+        # One batched request instead of a get_parameter round trip per value.
+        response = ssm_client.get_parameters(Names=list(SSM_PARAMETERS.values()), WithDecryption=True)
+        by_name = {parameter['Name']: parameter['Value'] for parameter in response.get('Parameters', [])}
+        missing = [name for name in SSM_PARAMETERS.values() if name not in by_name]
+        if missing:
+            raise ValueError(f"SSM parameters not found: {', '.join(missing)}")
+        values = {key: by_name[name] for key, name in SSM_PARAMETERS.items()}
+        if file_cache:
+            file_cache.write(values)
+
+    _ssm_cache.update(values)
+    return dict(values)
+
+
+def clear_ssm_cache():
+    # Forget the cached values, e.g. after a failure caused by a rotated password.
+    _ssm_cache.clear()
+    file_cache = EncryptedFileCache.from_environment()
+    if file_cache:
+        file_cache.clear()
+
+
+def get_snowflake_info(ssm_client=None):
+    if ssm_client is None:
+        session = boto3.session.Session()
+        ssm_client = session.client('ssm', region_name='us-east-1')
+    parameters = get_ssm_parameters(ssm_client)
     logging.info('Getting env info')
-    env_value = env
-
-    snf_acc_value = ssm_client.get_parameter(
-        Name='/users/snowflake/account',
-        WithDecryption=True).get('Parameter').get('Value')
-
-    snf_user_value = ssm_client.get_parameter(
-        Name='/users/snowflake/account/user',
-        WithDecryption=True).get(
-        'Parameter').get('Value')
-
-    snf_key_value = ssm_client.get_parameter(
-        Name='/users/snowflake/account/password',
-        WithDecryption=True).get(
-        'Parameter').get('Value')
+    env_value = parameters['env']
+    snf_acc_value = parameters['snf_account']
+    snf_user_value = parameters['snf_user']
+    snf_key_value = parameters['snf_key']
 
     env_var = {'env': env_value, 'snf_account': snf_acc_value,
                'snf_user': snf_user_value, 'snf_key': snf_key_value}
@@ -46,94 +98,21 @@ def get_snowflake_info(ssm_client):
     return env_var
 
 
-def get_recently_created_objects(connection, object_type, config):
-    try:
-        database = None
-
-        if object_type != 'DATABASE':
-            for item in config:
-                database = item.get("database")
-                if database:
-                    break
-
-            if not database:
-                print("Database not found in config")
-                return
-
-            if object_type.upper() == 'TABLE':
-                query = f"""
-                    SELECT TABLE_NAME
-                    FROM {database}.INFORMATION_SCHEMA.TABLES
-                    WHERE CREATED >= DATEADD(MINUTES, -5, CURRENT_TIMESTAMP()) and TABLE_TYPE = 'BASE TABLE'
-                """
-            elif object_type.upper() == 'VIEW':
-                query = f"""
-                    SELECT TABLE_NAME
-                    FROM {database}.INFORMATION_SCHEMA.VIEWS
-                    WHERE CREATED >= DATEADD(MINUTES, -5, CURRENT_TIMESTAMP())
-                """
-            elif object_type.upper() == 'SCHEMA':
-                query = f"""
-                    SELECT SCHEMA_NAME
-                    FROM {database}.INFORMATION_SCHEMA.SCHEMATA
-                    WHERE CREATED >= DATEADD(MINUTES, -5, CURRENT_TIMESTAMP())
-                """
-            else:
-                print(f"Object Type Is Not Valid: {object_type}")
-                return
-        else:
-            query = """
-            SELECT DATABASE_NAME
-            FROM INFORMATION_SCHEMA.DATABASES
-            WHERE CREATED >= DATEADD(MINUTES, -5, CURRENT_TIMESTAMP());
-            """
-        cursor = connection.cursor()
-        cursor.execute(query)
-        return cursor.fetchall()
-    except Exception as e:
-        print(f"Error occurred while fetching recently created {object_type}s:", e)
-        return []
-
-
-
 # Function to compare created tables/views with configuration
-def compare_objects_with_config(config, created_objects, object_type):
+def compare_objects_with_config(config, created_objects, object_type, index=None):
     try:
         if not config:
             print(f"No configuration available for {object_type}s")
             return
 
+        index = index or ConfigIndex(config)
         matched = []
         unmatched = []
-
         for obj in created_objects:
-            obj_name = obj[0].upper()
-
-            for item in config:
-                obj_name_config = item.get("object_name", "").upper()
-                obj_type = item.get("object_type", "").upper()
-
-                if obj_type == object_type.upper():
-                    if object_type == 'TABLE':
-                        if obj_name_config == obj_name:
-                            matched.append(obj_name)
-                            break
-                    if object_type == 'VIEW':
-                        if obj_name_config == obj_name:
-                            matched.append(obj_name)
-                            break
-                    elif object_type == 'SCHEMA':
-                        schema_config = item.get("schema", "").upper()
-                        if schema_config == obj_name:
-                            matched.append(obj_name)
-                            break
-                    elif object_type == 'DATABASE':
-                        database_config = item.get("database", "").upper()
-                        if database_config == obj_name:
-                            matched.append(obj_name)
-                            break
+            if index.matches(obj):
+                matched.append(obj)
             else:
-                unmatched.append(obj_name)
+                unmatched.append(obj)
 
         return matched, unmatched
     except Exception as e:
@@ -141,388 +120,148 @@ def compare_objects_with_config(config, created_objects, object_type):
         return [], []
 
 
-def grantee_privilege_exists(database, schema, object_name, grantee, privilege_type, object_type, connection):
-    try:
-        database = database.upper()
-        schema = schema.upper()
-        object_name = object_name.upper()
-        grantee = grantee.upper()
-        privilege_type = privilege_type.upper()
-        object_type = object_type.upper()
-        
-
-        if object_type == "TABLE" or object_type == "VIEW":
-            query = f"""
-                SELECT PRIVILEGE_TYPE
-                FROM {database}.INFORMATION_SCHEMA.OBJECT_PRIVILEGES
-                WHERE OBJECT_SCHEMA = '{schema}'
-                AND OBJECT_CATALOG = '{database}'
-                AND OBJECT_NAME = '{object_name}'
-                AND GRANTEE = '{grantee}'
-                AND PRIVILEGE_TYPE = '{privilege_type}'
-            """
-        elif object_type == "SCHEMA":
-            query = f"""
-                SELECT PRIVILEGE_TYPE
-                FROM {database}.INFORMATION_SCHEMA.OBJECT_PRIVILEGES
-                WHERE object_schema = '{schema}'
-                AND GRANTEE = '{grantee}'
-                AND PRIVILEGE_TYPE = '{privilege_type}'
-            """
-            print(query)
-        elif object_type == "DATABASE":
-            query = f"""
-                show grants on database {database}
-            """
-
-        cursor = connection.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        return bool(result)
-    except Exception as e:
-        print(f"Error occurred while checking privilege for {object_type}:", e)
-        return False
+def object_label(obj):
+    if obj.object_type == "DATABASE":
+        return obj.name
+    if obj.object_type == "SCHEMA":
+        return f"{obj.database}.{obj.name}"
+    return f"{obj.database}.{obj.schema}.{obj.name}"
+
+
+def schema_has_object_config(object_specific_schemas, object_type, database, schema):
+    database = (database or "").upper()
+    schema = (schema or "").upper()
+    return any(
+        (object_type, scoped_database, scoped_schema) in object_specific_schemas
+        for scoped_database in (database, "")
+        for scoped_schema in (schema, "")
+    )
+
 
+def object_grant_target(obj, item, query_tag, schema_wide=False):
+    if obj.object_type == "DATABASE":
+        return grant_target(obj.object_type, obj.name, "", obj.name, item, query_tag)
+    if obj.object_type == "SCHEMA":
+        return grant_target(obj.object_type, obj.database, obj.name, obj.name, item, query_tag)
+    return grant_target(obj.object_type, obj.database, obj.schema, obj.name, item, query_tag, schema_wide)
 
-def matched_objects_permission(config, json_data, conn):
+
+def matched_objects_permission(config, json_data, conn, snapshot=None, executor=None, index=None):
 
     try:
-        table_matched = json_data["tables"]["matched_tables"]
-        view_matched = json_data["views"]["matched_views"]
-        schema_matched = json_data["schema"]["matched_schema"]
-        matched_database = json_data["database"]["matched_database"]
-        for item in config:
-            database = item.get("database", "").upper()
-            schema = item.get("schema", "").upper()
-            object_name_config = item.get("object_name", "").upper()
-            object_type = item.get("object_type", "").upper()
-            grants = item.get("GRANTEE", [])
-            enforcement_action = item.get("enforcement_action")
-            table_matched_objects = []
-            view_matched_objects = []
-            if object_type == "TABLE":
-                table_matched_objects = table_matched
-            elif object_type == "VIEW":
-                view_matched_objects = view_matched
-            elif object_type == "SCHEMA":
-                schema_matched_objects = schema_matched
-            elif object_type == "DATABASE":
-                database_matched_objects = matched_database
-            else:
+        index = index or ConfigIndex(config)
+        matched_objects = (json_data["tables"]["matched_tables"] + json_data["views"]["matched_views"]
+                           + json_data["schema"]["matched_schema"] + json_data["database"]["matched_database"])
+        object_types = {item.get("object_type", "").upper() for item in config}
+        targets = []
+        for matched_object in matched_objects:
+            if matched_object.object_type not in object_types:
                 continue
-            if object_type == "TABLE":
-                for matched_object in table_matched_objects:
-                    if object_name_config == matched_object:
-                        print(f"    Assigning privileges for {object_type} '{matched_object}' based on config...")
-                        for grant in grants:
-                            grantee = list(grant.keys())[0]
-                            privileges = grant[grantee]
-                            for privilege_type in privileges:
-                                privilege_type = privilege_type
-                                if not grantee_privilege_exists(database, schema, matched_object, grantee, privilege_type, object_type, conn):
-                                    if enforcement_action == "enforce":
-                                        conn.cursor().execute("alter session set query_tag='matched_enforce_table';")
-                                        revoke_query = f"REVOKE ALL PRIVILEGES ON {object_type} {database}.{schema}.{matched_object} FROM ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(revoke_query)
-                                        print(f"        Revoked all privileges on {object_type} {database}.{schema}.{matched_object} from role {grantee}")
-                                        grant_query = f"GRANT {privilege_type} ON {object_type} {database}.{schema}.{matched_object} TO ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"        Granted {privilege_type} on {object_type} {database}.{schema}.{matched_object} to role {grantee}")
-                                    elif enforcement_action == "merge":
-                                        conn.cursor().execute("alter session set query_tag='matched_merge_table';")
-                                        grant_query = f"GRANT {privilege_type} ON TABLE {database}.{schema}.{matched_object} TO ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"        Granted {privilege_type} on TABLE {database}.{schema}.{matched_object} to role {grantee}")
-                                else:
-                                    print(f"        Privilege already exists for {database}.{schema}.{matched_object}: Object: {database}.{schema}.{matched_object}, grantee: {grantee}, Privilege: {privilege_type}")
-                        print("")
-            elif object_type == "VIEW":
-                for matched_object in view_matched_objects:
-                    if object_name_config == matched_object:
-                        print(f"    Assigning privileges for {object_type} '{matched_object}' based on config...")
-                        for grant in grants:
-                            grantee = list(grant.keys())[0]
-                            privileges = grant[grantee]
-
-                            privileges = grant[grantee]
-                            for privilege_type in privileges:
-                                privilege_type = privilege_type
-                                if not grantee_privilege_exists(database, schema, matched_object, grantee, privilege_type, object_type, conn):
-                                    if enforcement_action == "enforce":
-                                        conn.cursor().execute("alter session set query_tag='matched_enforce_view';")
-                                        revoke_query = f"REVOKE ALL PRIVILEGES ON {object_type} {database}.{schema}.{matched_object} FROM ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(revoke_query)
-                                        print(f"        Revoked all privileges on {object_type} {database}.{schema}.{matched_object} from role {grantee}")
-                                        grant_query = f"GRANT {privilege_type} ON {object_type} {database}.{schema}.{matched_object} TO ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"        Granted {privilege_type} ON {object_type} {database}.{schema}.{matched_object} to role {grantee}")
-                                    elif enforcement_action == "merge":
-                                        conn.cursor().execute("alter session set query_tag='matched_merge_view';")
-                                        grant_query = f"GRANT {privilege_type} ON {object_type} {database}.{schema}.{matched_object} TO ROLE {grantee}"
-
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"        Granted {privilege_type} on {object_type} {database}.{schema}.{matched_object} to role {grantee}")
-                                else:
-                                    print(f"        Privilege already exists for {database}.{schema}.{matched_object}: Object: {database}.{schema}.{matched_object}, grantee: {grantee}, Privilege: {privilege_type}")
-                        print("")
-            elif object_type == "SCHEMA":
-                for schema_matched_object in schema_matched_objects:
-                    if schema_matched_object == schema:
-                        print(f"    Assigning privileges for {object_type} '{schema_matched_object}' based on config...")
-                        for grant in grants:
-                            grantee = list(grant.keys())[0]
-                            privileges = grant[grantee]
-                            for privilege_type in privileges:
-                                privilege_type = privilege_type
-                                if not grantee_privilege_exists(database, schema, schema_matched_object, grantee, privilege_type, object_type, conn):
-                                    if enforcement_action == "enforce":
-                                        conn.cursor().execute("alter session set query_tag='matched_enforce_schema';")
-                                        revoke_query = f"REVOKE {privilege_type} ON SCHEMA {database}.{schema} FROM ROLE {grantee};"
-                                        cursor = conn.cursor()
-                                        cursor.execute(revoke_query)
-                                        print(f"        Revoked {privilege_type} ON Role: {grantee} and SCHEMA: {database}.{schema}")
-                                        grant_query = f"GRANT {privilege_type} ON SCHEMA {database}.{schema} TO ROLE {grantee};"
-
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"        Granted {privilege_type} ON Role :  {grantee} and SCHEMA is  {database}.{schema} ")
-                                    elif enforcement_action == "merge":
-                                        conn.cursor().execute("alter session set query_tag='matched_merge_schema';")
-                                        grant_query = f"GRANT {privilege_type} ON SCHEMA {database}.{schema} TO ROLE {grantee};"
-                                        print("        ", grant_query)
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"        Granted {privilege_type} on {object_type} {database}.{schema_matched_object} to role {grantee}")
-                                else:
-                                    print(f"        Privilege already exists for {database}.{schema}: Object: {database}.{schema} , grantee: {grantee}, Privilege: {privilege_type}")
-                        print("")
-            elif object_type == "DATABASE":
-                for database_matched_object in database_matched_objects:
-                    if database_matched_object == database:
-                        print(f"    Assigning privileges for {object_type} '{database_matched_object}' based on config...")
-                        for grant in grants:
-                            grantee = list(grant.keys())[0]
-                            # grantee = list(grant.keys())[0].upper()
-
-                            privileges = grant[grantee]
-                            for privilege_type in privileges:
-                                privilege_type = privilege_type.upper()
-                                # Ensure privilege_type is uppercase
-                                privilege_type = privilege_type.upper()
-                                # Check if the privilege already exists before granting
-                                if not grantee_privilege_exists(database, '', database, grantee, privilege_type, object_type, conn):
-                                    if enforcement_action == "enforce":
-                                        conn.cursor().execute("alter session set query_tag='matched_enforce_database';")
-                                        revoke_query = f"REVOKE {privilege_type} ON DATABASE {database} FROM ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(revoke_query)
-                                        print(f"    Revoked {privilege_type} on {object_type} {database} from role {grantee}")
-                                        grant_query = f"GRANT {privilege_type} ON DATABASE {database} TO ROLE {grantee}"
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"    Granted {privilege_type} on {object_type} {database} to role {grantee}")
-                                    elif enforcement_action == "merge":
-                                        conn.cursor().execute("alter session set query_tag='matched_merge_database';")
-                                        # Adjust the grant_query to grant the specified privilege type
-                                        grant_query = f"GRANT {privilege_type} ON DATABASE {database} TO ROLE {grantee}"
-                                        print("Grant Query is:", grant_query)
-
-                                        cursor = conn.cursor()
-                                        cursor.execute(grant_query)
-                                        print(f"    Granted {privilege_type} on {object_type} {database} to role {grantee}")
-                                else:
-                                    print(f"    Privilege already exists for {database}: Object: {database}, grantee: {grantee}, Privilege: {privilege_type}")
-                        print("")
-
+            try:
+                for item in index.object_blocks(matched_object):
+                    object_type = matched_object.object_type
+                    query_tag = f"matched_{item.get('enforcement_action')}_{object_type.lower()}"
+                    targets.append(object_grant_target(matched_object, item, query_tag))
+            except Exception as e:
+                # A bad block or object only skips that object.
+                print(f"Error occurred while planning {object_label(matched_object)}:", e)
+
+        return plan_and_execute(targets, conn, snapshot, executor)
     except Exception as e:
         print("Error occurred while processing matched objects:", e)
+        return []
 
 
-def unmatched_objects_permission(config, json_data, conn):
+def unmatched_objects_permission(config, json_data, conn, snapshot=None, executor=None, object_specific_schemas=None, index=None):
 
     try:
         unmatched_tables = json_data["tables"]["unmatched_tables"]
         unmatched_views = json_data["views"]["unmatched_views"]
         unmatched_schema = json_data["schema"]["unmatched_schema"]
         unmatched_database = json_data["database"]["unmatched_database"]
-        if not any(item['object_type'] == 'TABLE' and not item.get('object_name') for item in config):
-            print(" ")
-        else:
-            print("    Table: ")
+        if any(item['object_type'] == 'TABLE' and not item.get('object_name') for item in config):
+            logging.debug("    Table: ")
             i = 0
             for table in unmatched_tables:
                 i += 1
-                print(f"        {i}) {table}")
+                logging.debug(f"        {i}) {object_label(table)}")
 
-        if not any(item['object_type'] == 'VIEW' and not item.get('object_name') for item in config):
-            print(" ")
-        else:
-            print("    VIEWS:")
+        if any(item['object_type'] == 'VIEW' and not item.get('object_name') for item in config):
+            logging.debug("    VIEWS:")
             j = 0
             for view in unmatched_views:
                 j += 1
-                print(f"        {j}) {view}")
-
-        print(" ")
+                logging.debug(f"        {j}) {object_label(view)}")
 
-        if not any(item['object_type'] == 'SCHEMA' and not item.get('schema') for item in config):
-            print(" ")
-        else:
-            print("    SCHEMA:")
+        if any(item['object_type'] == 'SCHEMA' and not item.get('schema') for item in config):
+            logging.debug("    SCHEMA:")
             k = 0
             for schema in unmatched_schema:
                 k += 1
-                print(f"        {k}) {schema}")
-
-        print("")
+                logging.debug(f"        {k}) {object_label(schema)}")
 
-        if not any(item['object_type'] == 'DATABASE' and not item.get('database') for item in config):
-            print(" ")
-        else:
-            print("    DATABASE:")
+        if any(item['object_type'] == 'DATABASE' and not item.get('database') for item in config):
+            logging.debug("    DATABASE:")
             x = 0
             for database in unmatched_database:
                 x += 1
-                print(f"        {x}) {database}")
-
-        print("")
+                logging.debug(f"        {x}) {object_label(database)}")
 
-        for item in config:
-            database = item.get("database", "").upper()
-            schema = item.get("schema", "").upper()
-            object_name_config = item.get("object_name", "").upper()
-            object_type = item.get("object_type", "").upper()
-            grants = item.get("GRANTEE", [])
-            enforcement_action = item.get("enforcement_action")
-            if object_type == "TABLE" and not object_name_config:
-                print(f"Proccess Started for unmatched objects permission: {object_type}")
-                # If object name is not specified in config for tables, grant privileges to all unmatched tables
-                for table in unmatched_tables:
-
-                    print(f"    Assigning privileges for object type is : {object_type}  and table name is : {table} based on config...")
-                    for grant in grants:
-                        grantee = list(grant.keys())[0].upper()
-                        privileges = grant[grantee]
-                        for privilege_type in privileges:
-                            privilege_type = privilege_type.upper()
-
-                            if not grantee_privilege_exists(database, schema, table, grantee, privilege_type, object_type, conn):
-                                if enforcement_action == "enforce":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_enforce_table';")
-
-                                    revoke_query = f"REVOKE ALL PRIVILEGES ON {object_type} {database}.{schema}.{table} FROM ROLE {grantee}"
-                                    cursor = conn.cursor()
-                                    cursor.execute(revoke_query)
-                                    print(f"  GRANT {privilege_type} ON {object_type} {database}.{schema}.{table} TO ROLE {grantee}")
-                            else:
-                                print(f"        Privilege already exists for {object_type} {database}.{schema}.{table}: Object: {database}.{schema}.{table}, grantee: {grantee}, Privilege: {privilege_type}")
-                    print("")
-            elif object_type == "VIEW" and not object_name_config:
-                print(f"Proccess Started for unmatched objects permission: {object_type}")
-                # If object name is not specified in config for views, grant privileges to all unmatched views
-                for view in unmatched_views:
-                    print(f"    Assigning privileges for object type is : {object_type}  and View name is : {view} based on config...")
-
-                    for grant in grants:
-                        grantee = list(grant.keys())[0].upper()
-                        privileges = grant[grantee]
-                        for privilege_type in privileges:
-                            privilege_type = privilege_type.upper()
-                            if not grantee_privilege_exists(database, schema, view, grantee, privilege_type, object_type, conn):
-                                if enforcement_action == "enforce":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_enforce_view';")
-                                    revoke_query = f"REVOKE ALL PRIVILEGES ON {object_type} {database}.{schema}.{view} FROM ROLE {grantee}"
-                                    cursor = conn.cursor()
-                                    cursor.execute(revoke_query)
-                                    print(f"        Revoked all privileges on {object_type} {database}.{schema}.{view} from role {grantee}")
-                                    grant_query = f"GRANT {privilege_type} ON {object_type} {database}.{schema}.{view} TO ROLE {grantee}"
-                                    cursor = conn.cursor()
-                                    cursor.execute(grant_query)
-                                    print(f"        Granted {privilege_type} ON {object_type} {database}.{schema}.{view} to role {grantee}")
-                                elif enforcement_action == "merge":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_merge_view';")
-                                    grant_query = f"GRANT {privilege_type} ON {object_type} {database}.{schema}.{view} TO ROLE {grantee}"
-                                    print(grant_query)
-                                    cursor = conn.cursor()
-                                    cursor.execute(grant_query)
-                                    print(f"        Granted {privilege_type} ON {object_type} {database}.{schema}.{view} to role {grantee}")
-                            else:
-                                print(f"        Privilege already exists for {object_type} {database}.{schema}.{view}: Object: {database}.{schema}.{view}, grantee: {grantee}, Privilege: {privilege_type}")
-                    print("")
-            elif object_type == "SCHEMA" and not object_name_config:
-                print(f"Proccess Started for unmatched objects permission: {object_type}")
-                for schema in unmatched_schema:
-                    print(f"    Assigning privileges for object type is : {object_type}  and Schema name is : {schema} based on config...")
-                    for grant in grants:
-                        grantee = list(grant.keys())[0].upper()
-                        privileges = grant[grantee]
-                        for privilege_type in privileges:
-                            privilege_type = privilege_type.upper()
-                            table = ""
-                            if not grantee_privilege_exists(database, schema, table, grantee, privilege_type, object_type, conn):
-                                if enforcement_action == "enforce":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_enforce_schema';")
-                                    revoke_query = f"REVOKE {privilege_type} ON SCHEMA {database}.{schema} FROM ROLE {grantee};"
-                                    cursor = conn.cursor()
-                                    cursor.execute(revoke_query)
-                                    print(f"        Revoked {privilege_type} ON Role: {grantee} and SCHEMA: {database}.{schema}")
-                                    grant_query = f"GRANT {privilege_type} ON SCHEMA {database}.{schema} TO ROLE {grantee};"
-
-                                    cursor = conn.cursor()
-                                    cursor.execute(grant_query)
-                                    print(f"        Granted {privilege_type} ON Role :  {grantee} and SCHEMA is  {database}.{schema} ")
-                                elif enforcement_action == "merge":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_merge_schema';")
-                                    grant_query = f"GRANT {privilege_type} ON SCHEMA {database}.{schema} TO ROLE {grantee};"
-                                    print("        ", grant_query)
-
-                                    cursor = conn.cursor()
-                                    cursor.execute(grant_query)
-                                    print(f"        Granted {privilege_type} ON Role :  {grantee} and SCHEMA is  {database}.{schema} ")
-                            else:
-                                print(f"        Privilege already exists for schema {database}.{schema} Object: {database}.{schema}, grantee: {grantee}, Privilege: {privilege_type}")
-                    print("")
-            elif object_type == "DATABASE" and not object_name_config:
-                print(f"Proccess Started for unmatched objects permission: {object_type}")
-                for database in unmatched_database:
-                    print(f"    Assigning privileges for object type is : {object_type}  and Database is : {database} based on config...")
-                    for grant in grants:
-                        grantee = list(grant.keys())[0].upper()
-                        privileges = grant[grantee]
-                        for privilege_type in privileges:
-                            privilege_type = privilege_type.upper()
-                            table = ""
-                            if not grantee_privilege_exists(database, "", table, grantee, privilege_type, object_type, conn):
-                                if enforcement_action == "enforce":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_enforce_database';")
-                                    revoke_query = f"REVOKE {privilege_type} ON DATABASE {database} FROM ROLE {grantee}"
-                                    cursor = conn.cursor()
-                                    cursor.execute(revoke_query)
-                                    print(f"    Revoked {privilege_type} on {object_type} {database} from role {grantee}")
-                                    grant_query = f"GRANT {privilege_type} ON DATABASE {database} TO ROLE {grantee}"
-                                    cursor = conn.cursor()
-                                    cursor.execute(grant_query)
-                                    print(f"    Granted {privilege_type} on {object_type} {database} to role {grantee}")
-                                elif enforcement_action == "merge":
-                                    conn.cursor().execute("alter session set query_tag='unmatched_merge_database';")
-                                    grant_query = f"GRANT {privilege_type} ON DATABASE {database} TO ROLE {grantee}"
-                                    cursor = conn.cursor()
-                                    cursor.execute(grant_query)
-                                    print(f"    Granted {privilege_type} on {object_type} {database} to role {grantee}")
-                            else:
-                                print(f"    Privilege already exists for {database}: Object: {database}, grantee: {grantee}, Privilege: {privilege_type}")
-                        print("")
-                    print("")
+        index = index or ConfigIndex(config)
+        object_types = {item.get("object_type", "").upper() for item in config}
+        targets = []
+        for obj in unmatched_tables + unmatched_views + unmatched_schema + unmatched_database:
+            if obj.object_type not in object_types:
+                continue
+            # ON ALL ... IN SCHEMA would also reach objects that have their own object-wise config.
+            try:
+                schema_wide = (obj.object_type in ("TABLE", "VIEW") and object_specific_schemas is not None
+                               and not schema_has_object_config(object_specific_schemas, obj.object_type, obj.database, obj.schema))
+                for item in index.default_blocks(obj):
+                    query_tag = f"unmatched_{item.get('enforcement_action')}_{obj.object_type.lower()}"
+                    targets.append(object_grant_target(obj, item, query_tag, schema_wide))
+            except Exception as e:
+                # A bad block or object only skips that object.
+                print(f"Error occurred while planning {object_label(obj)}:", e)
+
+        print(f"Proccess Started for unmatched objects permission: {len(targets)} objects")
+        return plan_and_execute(targets, conn, snapshot, executor)
     except Exception as e:
         print("Error occurred while extracting unique object types:", e)
         return []
 
+
+def plan_and_execute(targets, conn, snapshot=None, executor=None):
+    if snapshot is None:
+        snapshot = PrivilegeSnapshot()
+    databases = {target["database"] or target["object_name"] for target in targets}
+    for database in sorted(database for database in databases if database):
+        if not snapshot.has_database(database):
+            snapshot.load(conn, database)
+
+    with phase("planning"):
+        plan = build_grant_plan(targets, snapshot)
+    count("planning.targets", len(targets))
+    if not plan:
+        print(f"    Privileges already in place for {len(targets)} objects")
+        return []
+    print(f"    Executing {len(plan)} statements for {len(targets)} objects")
+    with phase("execution"):
+        if executor is not None:
+            return executor.execute(plan, snapshot)
+        return execute_grant_plan(conn, plan, snapshot)
+
+
+def normalize_config(config):
+    for item in config:
+        if "object_type" in item:
+            item["object_type"] = item["object_type"].upper()
+        # Older configs spell the database key "datbase".
+        if "datbase" in item and "database" not in item:
+            item["database"] = item.pop("datbase")
+    return config
+
+
 def extract_unique_object_types(config):
     try:
         object_types = set()
@@ -534,156 +273,278 @@ def extract_unique_object_types(config):
         return []
 
 
-def grant_access_main():
+def load_privilege_snapshot(pool, snapshot, json_data, conn=None, engine=None):
+    # One OBJECT_PRIVILEGES pass per affected database instead of one query per privilege check,
+    # with the databases loaded concurrently: over the pool, or as async queries on conn.
+    databases = set()
+    for objects in json_data.values():
+        for discovered_objects in objects.values():
+            for obj in discovered_objects:
+                databases.add((obj.name if obj.object_type == "DATABASE" else obj.database).upper())
+    pending = sorted(database for database in databases if database and not snapshot.has_database(database))
+    if pending and engine is not None:
+        snapshot.load_databases(conn, pending, engine=engine)
+    elif pending:
+        map_with_connections(pool, pending, snapshot.load)
+    return snapshot
+
+
+def get_object_specific_schemas(config):
+    # (object_type, database, schema) of every object-wise block.
+    # A schema pattern may cover any schema of its database, so it is recorded unscoped.
+    return {
+        (item.get("object_type", "").upper(), item.get("database", "").upper(),
+         "" if is_pattern(item.get("schema")) else item.get("schema", "").upper())
+        for item in config if item.get("object_name")
+    }
+
+
+def connect_snowflake(sf_secret):
+    return snowflake.connector.connect(
+        user=sf_secret['snf_user'],
+        password=sf_secret['snf_key'],
+        account=sf_secret['snf_account'],
+        warehouse=sf_secret['warehouse'],
+        database=sf_secret['database'],
+        schema=sf_secret['schema'],
+        role=sf_secret['role'],
+        session_parameters={'QUERY_TAG': QUERY_TAG}
+    )
+
+
+def load_configs(directory=CONFIG_DIRECTORY):
+    configs = {}
+    for file in FILE_LIST:
+        file_path = os.path.join(directory, file)
+        with open(file_path, 'r') as f:
+            configs[file] = normalize_config(json.load(f))
+    return configs
+
+
+# Keys of the per-type matched/unmatched lists handed to the permission functions.
+OBJECT_TYPE_KEYS = {
+    "TABLE": ("tables", "matched_tables", "unmatched_tables"),
+    "VIEW": ("views", "matched_views", "unmatched_views"),
+    "SCHEMA": ("schema", "matched_schema", "unmatched_schema"),
+    "DATABASE": ("database", "matched_database", "unmatched_database"),
+}
+
+
+def apply_config_to_batch(file, config, index, batch, conn, snapshot, executor, object_specific_schemas, counts):
+    """Match one batch of discovered objects against one config file and grant them."""
+    results = []
+    json_data = {key: {matched_key: [], unmatched_key: []} for key, matched_key, unmatched_key in OBJECT_TYPE_KEYS.values()}
+    config_types = set(extract_unique_object_types(config))
+    with phase("matching"):
+        for obj_type in OBJECT_TYPE_KEYS:
+            if obj_type not in config_types:
+                continue
+            key, matched_key, unmatched_key = OBJECT_TYPE_KEYS[obj_type]
+            objects = [obj for obj in batch if obj.object_type == obj_type]
+            if objects:
+                json_data[key][matched_key], json_data[key][unmatched_key] = compare_objects_with_config(config, objects, obj_type, index)
+                counts[obj_type][0] += len(json_data[key][matched_key])
+                counts[obj_type][1] += len(json_data[key][unmatched_key])
+
+    if not any(discovered for objects in json_data.values() for discovered in objects.values()):
+        return results
+    with phase("privilege_snapshot"):
+        load_privilege_snapshot(executor.pool, snapshot, json_data, conn, getattr(executor, "engine", None))
+
+    for obj_type, (key, matched_key, unmatched_key) in OBJECT_TYPE_KEYS.items():
+        if not json_data[key][matched_key] and not json_data[key][unmatched_key]:
+            continue
+        blocks = [block for block in config if block.get('object_type') == obj_type]
+        if file == "object_vise_permission.json":
+            results.extend(matched_objects_permission(blocks, json_data, conn, snapshot, executor, index=index))
+        else:
+            # Schema-wide grants only apply to tables and views.
+            schemas = object_specific_schemas if obj_type in ("TABLE", "VIEW") else None
+            results.extend(unmatched_objects_permission(blocks, json_data, conn, snapshot, executor, schemas, index=index))
+    return results
+
+
+def hold_failed_objects(watermarks, batch, results):
+    # Objects touched by a failed statement keep the watermark at or before them, so the
+    # next run discovers them again.
+    failed = {key for statement, ok, _ in results if not ok for key in statement_keys(statement)}
+    for obj in batch:
+        if discovered_key(obj) in failed:
+            watermarks.hold(None if obj.object_type == "DATABASE" else obj.database, obj.object_type, obj.created)
+
+
+def print_discovery_summary(file, config, counts, config_directory=CONFIG_DIRECTORY):
+    print(os.path.join(config_directory, file))
+    config_types = set(extract_unique_object_types(config))
+    for obj_type, (matched, unmatched) in counts.items():
+        if obj_type not in config_types:
+            # Not discovered for this file, see apply_config_to_batch.
+            continue
+        if matched or unmatched:
+            print(f"    {obj_type}: {matched} matched, {unmatched} unmatched")
+        else:
+            print(f"Data Is Not Found Since Last Run For {obj_type}")
+
+
+def run_grant_cycle(conn, executor, configs, snapshot, watermarks, future_grants=False, cache=None,
+                    metadata=INFORMATION_SCHEMA_METADATA, skip_inherited=False, config_directory=CONFIG_DIRECTORY):
+    """Discover new objects and apply both config files once.
+
+    The connection, executor, configs, snapshot, watermarks and grant cache are owned by
+    the caller, so a long-running service can keep them warm between cycles. Objects the
+    cache knows to be compliant are skipped. With skip_inherited, the role hierarchy of
+    the configured roles is kept on the snapshot, and merge blocks do not grant what a
+    role already inherits.
+    """
+    results = []
+    object_specific_schemas = get_object_specific_schemas(configs["object_vise_permission.json"])
+
+    databases = resolve_scope_databases(conn, configs.values())
+    print(f"Databases in scope: {', '.join(databases) or 'none'}")
+    if skip_inherited and snapshot.role_graph is None:
+        with phase("role_graph"):
+            snapshot.role_graph = RoleGraph.load(conn, config_roles(configs.values()), executor.pool)
+        print(f"Role hierarchy loaded for {len(snapshot.role_graph.direct)} roles")
+    if future_grants:
+        # New objects pick up the default grants at creation time; the polling pass
+        # below only verifies and backfills them.
+        print("Syncing future grants for default permissions")
+        with phase("future_grants"):
+            results.extend(sync_future_grants(executor, configs["default_permission.json"], databases))
+
+    # Every object type of every config file is discovered in one query per database and
+    # streamed in fetchmany batches; each batch is matched and granted for both config
+    # files before the next one is taken, so memory stays bounded.
+    discovery = create_discovery_stream(
+        metadata, {object_type for config in configs.values() for object_type in extract_unique_object_types(config)},
+        watermarks)
+    indexes = {file: ConfigIndex(configs[file]) for file in FILE_LIST}
+    counts = {file: {obj_type: [0, 0] for obj_type in OBJECT_TYPE_KEYS} for file in FILE_LIST}
+    skipped = 0
+    # The async executor also submits the discovery and snapshot queries asynchronously.
+    for batch in discovery.batches(conn, executor.pool, databases, getattr(executor, "engine", None)):
+        count("discovery.batches")
+        if cache is not None:
+            known = len(batch)
+            with phase("grant_cache"):
+                batch = cache.unknown(batch)
+            skipped += known - len(batch)
+            if not batch:
+                continue
+        batch_results = []
+        for file in FILE_LIST:
+            batch_results.extend(apply_config_to_batch(file, configs[file], indexes[file], batch, conn, snapshot,
+                                                       executor, object_specific_schemas, counts[file]))
+        if cache is not None:
+            cache.record_results(batch_results)
+            cache.mark_reconciled(batch, [statement for statement, ok, _ in batch_results if not ok])
+        hold_failed_objects(watermarks, batch, batch_results)
+        results.extend(batch_results)
+    if cache is not None:
+        print(f"Skipped {skipped} objects already reconciled")
+        count("grant_cache.skipped", skipped)
+
+    for file in FILE_LIST:
+        print_discovery_summary(file, configs[file], counts[file], config_directory)
+
+    # Every config file has been processed, so the discovered objects are covered, except
+    # those held for a failed statement.
+    watermarks.commit()
+    print_results_summary(results)
+    return results
+
+
+def grant_access_main(max_workers=None, batch_size=DEFAULT_BATCH_SIZE, watermark_file=None, future_grants=False,
+                      grant_cache_file=None, grant_cache_ttl=DEFAULT_GRANT_CACHE_TTL_SECONDS,
+                      config_directory=CONFIG_DIRECTORY, ssm_client=None, connect=connect_snowflake,
+                      report_file=None, profile_file=None, async_queries=False, metadata=INFORMATION_SCHEMA_METADATA,
+                      skip_inherited=False):
+    # ssm_client and connect can be replaced, e.g. by the in-memory account of fake_snowflake.
+    results = []
+    report = start_run_report()
+    try:
+        with profiled(profile_file):
+            results = run_grant_access(max_workers, batch_size, watermark_file, future_grants, grant_cache_file,
+                                       grant_cache_ttl, config_directory, ssm_client, connect, async_queries, metadata,
+                                       skip_inherited)
+    except Exception as e:
+        print("Error occurred while profiling:", e)
+    report.finish()
+    for line in report.summary_lines():
+        print(line)
+    if report_file:
+        report.write(report_file)
+    return results
+
+
+def run_grant_access(max_workers, batch_size, watermark_file, future_grants, grant_cache_file, grant_cache_ttl,
+                     config_directory, ssm_client, connect, async_queries=False, metadata=INFORMATION_SCHEMA_METADATA,
+                     skip_inherited=False):
     conn = {}
+    executor = None
+    cache = None
+    results = []
     try:
-        session = boto3.session.Session()
-        client = session.client('ssm', region_name='us-east-1')
-        sf_secret = get_snowflake_info(client)
-
-        sf_secret = get_snowflake_info(client)
-
-        conn = snowflake.connector.connect(
-            user=sf_secret['snf_user'],
-            password=sf_secret['snf_key'],
-            account=sf_secret['snf_account'],
-            warehouse=sf_secret['warehouse'],
-            database=sf_secret['database'],
-            schema=sf_secret['schema'],
-            role=sf_secret['role']
-        )
-
-
-        file_list = ["default_permission.json","object_vise_permission.json"]
-        current_directory = os.path.dirname(os.path.realpath(__file__))
-        for file in file_list:
-            file_path = os.path.join(current_directory, file)
-            print(file_path)
-
-            with open(file_path, 'r') as f:
-                config = json.load(f)
-            for item in config:
-                if "object_type" in item:
-                    item["object_type"] = item["object_type"].upper()
-
-            if conn:
-                table_matched = []
-                table_unmatched = []
-                view_matched = []
-                view_unmatched = []
-                schema_matched = []
-
-                schema_unmatched = []
-                database_matched = []
-                database_unmatched = []
-                unique_object_types = extract_unique_object_types(config)
-                print(unique_object_types)
-                for obj_type in unique_object_types:
-                    if obj_type == 'TABLE':
-                        recently_created_tables = get_recently_created_objects(conn, obj_type, config)
-                        if not recently_created_tables:
-                            print("No tables found in the last 5 minutes.")
-                        else:
-                            table_matched, table_unmatched = compare_objects_with_config(config, recently_created_tables, obj_type)
-                    elif obj_type == 'VIEW':
-                        recently_created_views = get_recently_created_objects(conn, obj_type, config)
-                        if not recently_created_views:
-                            print("No views found in the last 5 minutes.")
-                            view_matched = []
-                            view_unmatched = []
-                        else:
-                            view_matched, view_unmatched = compare_objects_with_config(config, recently_created_views, obj_type)
-                    elif obj_type == 'SCHEMA':
-                        recently_created_schema = get_recently_created_objects(conn, obj_type, config)
-                        if not recently_created_schema:
-                            print("No schemas found in the last 5 minutes.")
-                            schema_matched = []
-                            schema_unmatched = []
-                        else:
-                            schema_matched, schema_unmatched = compare_objects_with_config(config, recently_created_schema, obj_type)
-                    elif obj_type == 'DATABASE':
-                        recently_created_database = get_recently_created_objects(conn, obj_type, config)
-                        if not recently_created_database:
-                            print("No schemas found in the last 5 minutes.")
-                            database_matched = []
-                            database_unmatched = []
-                        else:
-                            database_matched, database_unmatched = compare_objects_with_config(config, recently_created_database, obj_type)
-                    else:
-                        for obj_type in unique_object_types:
-                            print("Currenlty Supported Objets Are: ", obj_type)
-
-                        print(f"Currenlty Not Support {obj_type} This Object To Assign Permition")
-
-                print("")
-
-                json_data = {
-                    "tables": {
-                        "matched_tables": table_matched,
-                        "unmatched_tables": table_unmatched
-                    },
-                    "views": {
-                        "matched_views": view_matched,
-                        "unmatched_views": view_unmatched
-                    },
-                    "schema": {
-                        "matched_schema": schema_matched,
-                        "unmatched_schema": schema_unmatched
-                    },
-                    "database": {
-                        "matched_database": database_matched,
-                        "unmatched_database": database_unmatched
-                    }
-                }
-
-                json_string = json.dumps(json_data, indent=4)
-                print(json_string)
-
-                if (not json_data["tables"].get("matched_tables") and not json_data["tables"].get("unmatched_tables")):
-                    print("Data Is Not Found In Last 5 MINUTES For TABLE")
-                else:
-                    table_blocks = [block for block in config if block.get('object_type') == 'TABLE']
-                    if file == "object_vise_permission.json":
-                        matched_objects_permission(table_blocks, json_data, conn)
-                    else:
-                        print("Start Assign Default permissions to object")
-                        unmatched_objects_permission(table_blocks, json_data, conn)
-
-                if (not json_data["views"].get("matched_views") and not json_data["views"].get("unmatched_views")):
-                    print("Data Is Not Found In Last 5 MINUTES For VIEWS")
-                else:
-                    views_blocks = [block for block in config if block.get('object_type') == 'VIEW']
-                    if file == "object_vise_permission.json":
-                        matched_objects_permission(views_blocks, json_data, conn)
-                    else:
-                        print("Start Assign Default permissions to object")
-                        unmatched_objects_permission(views_blocks, json_data, conn)
-
-                if (not json_data["schema"].get("matched_schema") and not json_data["schema"].get("unmatched_schema")):
-                    print("")
-                    print("Data Is Not Found In Last 5 MINUTES For SCHEMA")
-                else:
-                    schema_blocks = [block for block in config if block.get('object_type') == 'SCHEMA']
-                    if file == "object_vise_permission.json":
-                        matched_objects_permission(schema_blocks, json_data, conn)
-                    else:
-                        print("Start Assign Default permissions to object type")
-                        unmatched_objects_permission(schema_blocks, json_data, conn)
-                if (not json_data["database"].get("matched_database") and not json_data["database"].get("unmatched_database")):
-                    print("")
-                    print("Data Is Not Found In Last 5 MINUTES For Database")
-                else:
-                    database_blocks = [block for block in config if block.get('object_type') == 'DATABASE']
-                    if file == "object_vise_permission.json":
-                        matched_objects_permission(database_blocks, json_data, conn)
-                    else:
-                        print("Start Assign Default permissions to object")
-                        unmatched_objects_permission(database_blocks, json_data, conn)
-            else:
-                print("Connection not established. Exiting...")
+        if ssm_client is None:
+            session = boto3.session.Session()
+            ssm_client = session.client('ssm', region_name='us-east-1')
+        sf_secret = get_snowflake_info(ssm_client)
+
+        conn = connect(sf_secret)
+        pool = ConnectionPool(lambda: connect(sf_secret), max_workers or get_max_workers(), QUERY_TAG)
+        if async_queries:
+            executor = AsyncGrantExecutor(pool, batch_size)
+        else:
+            executor = GrantExecutor(pool, batch_size)
+
+        configs = load_configs(config_directory)
+        watermarks = WatermarkStore(watermark_file or os.path.join(config_directory, WATERMARK_FILE))
+        cache = open_grant_cache(grant_cache_file, configs, grant_cache_ttl)
+        results = run_grant_cycle(conn, executor, configs, create_snapshot(metadata, configs.values()), watermarks,
+                                  future_grants, cache, metadata, skip_inherited, config_directory)
 
     except Exception as e:
         print("Error occurred in main:", e)
     finally:
+        if cache:
+            cache.close()
+        if executor:
+            executor.close()
         if conn:
             conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign Snowflake privileges to recently created objects")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Number of concurrent grant workers and pooled connections (default: based on CPU count)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Statements sent per multi-statement request, 1 disables batching")
+    parser.add_argument("--watermark-file", default=None,
+                        help=f"State file of discovery high-water marks (default: {WATERMARK_FILE} next to this script)")
+    parser.add_argument("--future-grants", action="store_true",
+                        help="Keep GRANT ... ON FUTURE grants in sync with the default permission blocks")
+    parser.add_argument("--grant-cache", default=None,
+                        help="SQLite file remembering reconciled objects, so repeat runs skip them (default: disabled)")
+    parser.add_argument("--grant-cache-ttl", type=int, default=DEFAULT_GRANT_CACHE_TTL_SECONDS,
+                        help="Seconds a reconciled object is trusted before it is checked again")
+    parser.add_argument("--report", default=None,
+                        help="Write the JSON run report (phase timers, counters, latency histograms) to this file")
+    parser.add_argument("--profile", default=None,
+                        help="Profile the run with cProfile and write the stats to this file")
+    parser.add_argument("--async-queries", action="store_true",
+                        help="Submit discovery, snapshot and grant queries with execute_async and poll for them")
+    parser.add_argument("--metadata", choices=METADATA_BACKENDS, default=INFORMATION_SCHEMA_METADATA,
+                        help="Read objects and grants from INFORMATION_SCHEMA (needs a warehouse) or with SHOW "
+                             "commands, which run without one")
+    parser.add_argument("--skip-inherited", action="store_true",
+                        help="Do not grant merge privileges a role already inherits through a granted role")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log every executed statement and every unmatched object")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format="%(message)s")
+    grant_access_main(max_workers=args.max_workers, batch_size=args.batch_size, watermark_file=args.watermark_file,
+                      future_grants=args.future_grants, grant_cache_file=args.grant_cache,
+                      grant_cache_ttl=args.grant_cache_ttl, report_file=args.report, profile_file=args.profile,
+                      async_queries=args.async_queries, metadata=args.metadata, skip_inherited=args.skip_inherited)
@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+
+from grant_diff import diff_targets
+from run_report import count
+
+
+# OWNERSHIP is never part of the config and must never be revoked by enforcement.
+PROTECTED_PRIVILEGES = {"OWNERSHIP"}
+
+# Minimum number of new objects in one schema before identical default grants are
+# replaced by a single GRANT ... ON ALL <objects> IN SCHEMA.
+SCHEMA_WIDE_GRANT_THRESHOLD = 10
+
+PLURAL_OBJECT_TYPES = {"TABLE": "TABLES", "VIEW": "VIEWS", "SCHEMA": "SCHEMAS"}
+
+
+@dataclass(frozen=True)
+class GrantStatement:
+    action: str
+    privileges: tuple
+    object_type: str
+    database: str
+    schema: str
+    object_name: str
+    grantee: str
+    query_tag: str = ""
+    # OBJECT targets a single object, ALL every existing object of the type in the
+    # schema and FUTURE the objects created later in the schema or database.
+    scope: str = "OBJECT"
+    # Objects covered by a schema-wide statement, used to update the snapshot.
+    objects: tuple = ()
+
+    @property
+    def target(self):
+        if self.scope != "OBJECT":
+            container = f"SCHEMA {self.database}.{self.schema}" if self.schema else f"DATABASE {self.database}"
+            return f"{self.scope} {PLURAL_OBJECT_TYPES[self.object_type]} IN {container}"
+        if self.object_type == "DATABASE":
+            return f"DATABASE {self.database}"
+        if self.object_type == "SCHEMA":
+            return f"SCHEMA {self.database}.{self.schema}"
+        return f"{self.object_type} {self.database}.{self.schema}.{self.object_name}"
+
+    @property
+    def sql(self):
+        direction = "TO" if self.action == "GRANT" else "FROM"
+        return f"{self.action} {', '.join(self.privileges)} ON {self.target} {direction} ROLE {self.grantee}"
+
+
+def config_grants(item):
+    # Normalise the grantee list of a config block to {GRANTEE: [PRIVILEGE, ...]}.
+    grants = {}
+    for grant in item.get("grantee", item.get("GRANTEE", [])):
+        for grantee, privileges in grant.items():
+            grantee_privileges = grants.setdefault(grantee.upper(), [])
+            for privilege in privileges:
+                if privilege.upper() not in grantee_privileges:
+                    grantee_privileges.append(privilege.upper())
+    return grants
+
+
+def grant_target(object_type, database, schema, object_name, item, query_tag="", schema_wide=False):
+    return {
+        "object_type": object_type.upper(),
+        "database": (database or "").upper(),
+        "schema": (schema or "").upper(),
+        "object_name": (object_name or "").upper(),
+        "enforcement_action": item.get("enforcement_action", "merge"),
+        "grants": config_grants(item),
+        "query_tag": query_tag,
+        # Default-permission targets may be folded into one schema-wide grant.
+        "schema_wide": schema_wide and item.get("enforcement_action", "merge") == "merge",
+    }
+
+
+def target_statements(target, snapshot, diff=None):
+    # diff is the {grantee: (extra, missing)} computed by grant_diff, if any.
+    object_type = target["object_type"]
+    database = target["database"]
+    schema = target["schema"]
+    object_name = target["object_name"]
+    if object_type == "DATABASE":
+        database = database or object_name
+        object_name = database
+    elif object_type == "SCHEMA":
+        schema = schema or object_name
+        object_name = schema
+
+    revokes = []
+    grants = []
+    for grantee, privileges in target["grants"].items():
+        # One existence check per grantee, answered by a snapshot lookup or by the Arrow diff.
+        if diff is None:
+            count("existence_checks.snapshot")
+            current = snapshot.privileges(object_type, database, schema, object_name, grantee)
+            extra = current - set(privileges)
+            missing = tuple(privilege for privilege in privileges if privilege not in current)
+        else:
+            count("existence_checks.arrow")
+            extra, missing_privileges = diff.get(grantee, (set(), set()))
+            missing = tuple(privilege for privilege in privileges if privilege in missing_privileges)
+        if missing and snapshot.role_graph is not None and target["enforcement_action"] == "merge":
+            # Held through a granted role already; enforce blocks still want the direct grant.
+            inherited = [privilege for privilege in missing if snapshot.role_graph.inherited_from(
+                grantee, object_type, database, schema, object_name, privilege)]
+            if inherited:
+                count("planning.inherited_skipped", len(inherited))
+                missing = tuple(privilege for privilege in missing if privilege not in inherited)
+        if target["enforcement_action"] == "enforce":
+            extra = sorted(extra - PROTECTED_PRIVILEGES)
+            if extra:
+                revokes.append(GrantStatement("REVOKE", tuple(extra), object_type, database, schema,
+                                              object_name, grantee, target["query_tag"]))
+        if missing:
+            grants.append(GrantStatement("GRANT", missing, object_type, database, schema,
+                                         object_name, grantee, target["query_tag"]))
+    return revokes + grants
+
+
+def schema_wide_statements(members, threshold):
+    # members is a list of (target, statements) of one object type in one schema.
+    signatures = {frozenset((statement.grantee, statement.privileges) for statement in statements)
+                  for _, statements in members}
+    if len(members) < threshold or len(signatures) != 1:
+        return None
+    signature = signatures.pop()
+    if not signature:
+        return None
+    target = members[0][0]
+    objects = tuple(member_target["object_name"] for member_target, _ in members)
+    return [
+        GrantStatement("GRANT", privileges, target["object_type"], target["database"], target["schema"],
+                       "", grantee, target["query_tag"], scope="ALL", objects=objects)
+        for grantee, privileges in sorted(signature)
+    ]
+
+
+def build_grant_plan(targets, snapshot, schema_wide_threshold=SCHEMA_WIDE_GRANT_THRESHOLD):
+    """Diff the desired grants of each target against the snapshot.
+
+    merge blocks only grant what is missing. enforce blocks additionally revoke
+    the privileges a configured grantee holds that are not in the config. The
+    privileges of one object and grantee are coalesced into one statement, and
+    revokes are ordered before the grants of the same object.
+
+    When every new object of a schema-wide target group needs the same grants, the
+    group is planned as GRANT ... ON ALL <objects> IN SCHEMA instead.
+    """
+    plan = []
+    schema_groups = {}
+    # Large plans are diffed with Arrow anti-joins when pyarrow is available.
+    diffs = diff_targets(targets, snapshot)
+    for position, target in enumerate(targets):
+        statements = target_statements(target, snapshot, diffs[position] if diffs is not None else None)
+        if (target.get("schema_wide") and target["object_type"] in ("TABLE", "VIEW")
+                and target["database"] and target["schema"]):
+            key = (target["object_type"], target["database"], target["schema"], target["query_tag"])
+            schema_groups.setdefault(key, []).append((target, statements))
+        else:
+            plan.extend(statements)
+
+    for members in schema_groups.values():
+        statements = schema_wide_statements(members, schema_wide_threshold)
+        if statements is None:
+            statements = [statement for _, member_statements in members for statement in member_statements]
+        plan.extend(statements)
+    return plan
+
+
+def apply_to_snapshot(snapshot, statement):
+    if snapshot is None or statement.scope == "FUTURE":
+        return
+    object_names = statement.objects if statement.scope == "ALL" else (statement.object_name,)
+    for object_name in object_names:
+        for privilege in statement.privileges:
+            if statement.action == "GRANT":
+                snapshot.add(statement.object_type, statement.database, statement.schema,
+                             object_name, statement.grantee, privilege)
+            else:
+                snapshot.remove(statement.object_type, statement.database, statement.schema,
+                                object_name, statement.grantee, privilege)
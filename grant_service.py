@@ -0,0 +1,199 @@
+import argparse
+import os
+import time
+
+import boto3
+
+from grant_cache import DEFAULT_GRANT_CACHE_TTL_SECONDS, open_grant_cache
+from grant_executor import DEFAULT_BATCH_SIZE, ConnectionPool, GrantExecutor, is_connection_closed, summarize_results
+from grant_permition_to_objects import (CONFIG_DIRECTORY, FILE_LIST, QUERY_TAG, WATERMARK_FILE, clear_ssm_cache,
+                                        connect_snowflake, get_snowflake_info, load_configs, run_grant_cycle)
+from discovery_watermark import WatermarkStore
+from main import get_max_workers
+from run_report import start_run_report
+from show_metadata import INFORMATION_SCHEMA_METADATA, METADATA_BACKENDS, create_snapshot
+
+
+# Lambda only allows writes under /tmp, which survives between warm invocations.
+WATERMARK_FILE_ENV = "GRANT_ACCESS_WATERMARK_FILE"
+LAMBDA_WATERMARK_FILE = os.path.join("/tmp", WATERMARK_FILE)
+# Optional SQLite grant cache, e.g. /tmp/grant_cache.db on Lambda.
+GRANT_CACHE_FILE_ENV = "GRANT_ACCESS_GRANT_CACHE_FILE"
+# "show" keeps frequent invocations off the warehouse.
+METADATA_ENV = "GRANT_ACCESS_METADATA"
+SKIP_INHERITED_ENV = "GRANT_ACCESS_SKIP_INHERITED"
+# Privileges granted outside this process are only picked up once the snapshot is reloaded.
+DEFAULT_SNAPSHOT_TTL_SECONDS = 900
+DEFAULT_INTERVAL_SECONDS = 60
+
+
+class GrantAccessService:
+    """Long-lived grant runner that keeps its expensive state warm between ticks.
+
+    The credentials, connections, parsed config files and privilege snapshot survive
+    from one tick to the next and are only revalidated: connections are reopened once
+    closed, config files are re-read when their mtime changes and the snapshot is
+    dropped after `snapshot_ttl_seconds`.
+    """
+
+    def __init__(self, max_workers=None, batch_size=DEFAULT_BATCH_SIZE, watermark_file=None,
+                 future_grants=False, snapshot_ttl_seconds=DEFAULT_SNAPSHOT_TTL_SECONDS,
+                 config_directory=CONFIG_DIRECTORY, grant_cache_file=None,
+                 grant_cache_ttl=DEFAULT_GRANT_CACHE_TTL_SECONDS, metadata=INFORMATION_SCHEMA_METADATA,
+                 skip_inherited=False):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.future_grants = future_grants
+        self.snapshot_ttl_seconds = snapshot_ttl_seconds
+        self.config_directory = config_directory
+        self.grant_cache_file = grant_cache_file
+        self.grant_cache_ttl = grant_cache_ttl
+        self.metadata = metadata
+        # The role hierarchy lives on the snapshot, so it is reloaded together with it.
+        self.skip_inherited = skip_inherited
+        self.watermarks = WatermarkStore(watermark_file or os.path.join(config_directory, WATERMARK_FILE))
+        self._sf_secret = None
+        self._conn = None
+        self._executor = None
+        self._configs = None
+        self._config_mtimes = None
+        self._snapshot = None
+        self._snapshot_loaded_at = 0
+        self._cache = None
+        self.last_report = None
+
+    def _ensure_connection(self):
+        if self._sf_secret is None:
+            client = boto3.session.Session().client('ssm', region_name='us-east-1')
+            self._sf_secret = get_snowflake_info(client)
+        if self._conn is None or is_connection_closed(self._conn):
+            print("Opening Snowflake connection")
+            self._conn = connect_snowflake(self._sf_secret)
+        if self._executor is None:
+            sf_secret = self._sf_secret
+            pool = ConnectionPool(lambda: connect_snowflake(sf_secret), self.max_workers or get_max_workers(),
+                                  QUERY_TAG)
+            self._executor = GrantExecutor(pool, self.batch_size)
+
+    def _ensure_configs(self):
+        mtimes = [os.path.getmtime(os.path.join(self.config_directory, file)) for file in FILE_LIST]
+        if self._configs is None or mtimes != self._config_mtimes:
+            print("Loading config files")
+            self._configs = load_configs(self.config_directory)
+            self._config_mtimes = mtimes
+            # Blocks may have changed, so privileges checked against the old config are stale too.
+            self._snapshot = None
+            if self._cache:
+                self._cache.close()
+            self._cache = open_grant_cache(self.grant_cache_file, self._configs, self.grant_cache_ttl)
+
+    def _ensure_snapshot(self):
+        if self._snapshot is None or time.monotonic() - self._snapshot_loaded_at > self.snapshot_ttl_seconds:
+            self._snapshot = create_snapshot(self.metadata, self._configs.values())
+            self._snapshot_loaded_at = time.monotonic()
+
+    def tick(self):
+        """Run one discovery/grant cycle and return its granted/revoked/failed counts and run report."""
+        self.last_report = start_run_report()
+        self._ensure_connection()
+        self._ensure_configs()
+        self._ensure_snapshot()
+        results = run_grant_cycle(self._conn, self._executor, self._configs, self._snapshot,
+                                  self.watermarks, self.future_grants, self._cache, self.metadata,
+                                  self.skip_inherited, self.config_directory)
+        summary = summarize_results(results)
+        summary["report"] = self.last_report.finish().to_dict()
+        return summary
+
+    def close(self):
+        if self._cache:
+            self._cache.close()
+            self._cache = None
+            # Reopened together with the configs on the next tick.
+            self._configs = None
+        if self._executor:
+            self._executor.close()
+            self._executor = None
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def reset(self):
+        # After a failed tick: the password may have been rotated, so the credentials are
+        # read from SSM again along with new connections. Marks the failed tick observed
+        # were never processed, so they are not committed by a later tick.
+        self.close()
+        self.watermarks.discard()
+        self._sf_secret = None
+        clear_ssm_cache()
+
+
+# Module level, so warm Lambda invocations reuse the service of the previous one.
+_service = None
+
+
+def lambda_handler(event, context):
+    global _service
+    if _service is None:
+        _service = GrantAccessService(
+            watermark_file=os.environ.get(WATERMARK_FILE_ENV, LAMBDA_WATERMARK_FILE),
+            grant_cache_file=os.environ.get(GRANT_CACHE_FILE_ENV),
+            metadata=os.environ.get(METADATA_ENV, INFORMATION_SCHEMA_METADATA),
+            skip_inherited=os.environ.get(SKIP_INHERITED_ENV, "").lower() in ("1", "true", "yes"),
+            future_grants=bool((event or {}).get("future_grants")))
+    try:
+        return _service.tick()
+    except Exception as e:
+        print("Error occurred in lambda handler:", e)
+        # Start from a clean slate on the next invocation.
+        _service.reset()
+        _service = None
+        raise
+
+
+def run_daemon(interval_seconds=DEFAULT_INTERVAL_SECONDS, **kwargs):
+    service = GrantAccessService(**kwargs)
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                service.tick()
+                for line in service.last_report.summary_lines():
+                    print(line)
+            except Exception as e:
+                print("Error occurred in grant cycle:", e)
+                service.reset()
+            time.sleep(max(0, interval_seconds - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("Stopping grant service")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep applying the grant configs on an interval.")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL_SECONDS,
+                        help="Seconds between the start of two grant cycles")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Number of concurrent Snowflake connections (defaults to the CPU count)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Grant statements sent per round trip")
+    parser.add_argument("--watermark-file", default=None,
+                        help="State file holding the last processed CREATED timestamps")
+    parser.add_argument("--future-grants", action="store_true",
+                        help="Also manage ON FUTURE grants for the default permission blocks")
+    parser.add_argument("--snapshot-ttl", type=int, default=DEFAULT_SNAPSHOT_TTL_SECONDS,
+                        help="Seconds before the cached privileges are reloaded from Snowflake")
+    parser.add_argument("--grant-cache", default=None,
+                        help="SQLite file remembering reconciled objects, so later ticks skip them")
+    parser.add_argument("--grant-cache-ttl", type=int, default=DEFAULT_GRANT_CACHE_TTL_SECONDS,
+                        help="Seconds a reconciled object is trusted before it is checked again")
+    parser.add_argument("--metadata", choices=METADATA_BACKENDS, default=INFORMATION_SCHEMA_METADATA,
+                        help="Read objects and grants from INFORMATION_SCHEMA or with warehouse-free SHOW commands")
+    parser.add_argument("--skip-inherited", action="store_true",
+                        help="Do not grant merge privileges a role already inherits through a granted role")
+    args = parser.parse_args()
+    run_daemon(args.interval, max_workers=args.max_workers, batch_size=args.batch_size,
+               watermark_file=args.watermark_file, future_grants=args.future_grants,
+               snapshot_ttl_seconds=args.snapshot_ttl, grant_cache_file=args.grant_cache,
+               grant_cache_ttl=args.grant_cache_ttl, metadata=args.metadata, skip_inherited=args.skip_inherited)
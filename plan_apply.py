@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+from dataclasses import asdict
+
+import boto3
+
+from grant_executor import DEFAULT_BATCH_SIZE, ConnectionPool, GrantExecutor
+from grant_permition_to_objects import (CONFIG_DIRECTORY, QUERY_TAG, WATERMARK_FILE, connect_snowflake, get_snowflake_info,
+                                        load_configs, run_grant_cycle)
+from grant_plan import GrantStatement, apply_to_snapshot
+from discovery_watermark import WatermarkStore
+from main import get_max_workers
+from privilege_snapshot import PrivilegeSnapshot
+
+
+class PlanRecorder:
+    """Stands in for the GrantExecutor and collects the statements instead of executing them.
+
+    The snapshot is updated as if the statements had run, so later targets of the same
+    run are planned against the state the plan leads to.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.statements = []
+
+    def execute(self, plan, snapshot=None):
+        self.statements.extend(plan)
+        for statement in plan:
+            apply_to_snapshot(snapshot, statement)
+        return []
+
+
+def statement_to_dict(statement):
+    return asdict(statement)
+
+
+def statement_from_dict(values):
+    values = dict(values)
+    values["privileges"] = tuple(values["privileges"])
+    values["objects"] = tuple(values.get("objects", ()))
+    return GrantStatement(**values)
+
+
+def is_sql_file(file_path):
+    return file_path.lower().endswith(".sql")
+
+
+def write_plan(statements, file_path):
+    """Write the plan as JSON Lines, or as a SQL script when the file ends in .sql."""
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w') as f:
+        if is_sql_file(file_path):
+            query_tag = None
+            for statement in statements:
+                if statement.query_tag and statement.query_tag != query_tag:
+                    f.write(f"alter session set query_tag='{statement.query_tag}';\n")
+                    query_tag = statement.query_tag
+                f.write(f"{statement.sql};\n")
+        else:
+            for statement in statements:
+                f.write(json.dumps(statement_to_dict(statement), separators=(",", ":")) + "\n")
+    os.replace(temp_path, file_path)
+
+
+def read_plan(file_path):
+    if is_sql_file(file_path):
+        raise ValueError("SQL plans are for review only, apply the JSON Lines plan instead")
+    with open(file_path, 'r') as f:
+        return [statement_from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def plan_main(output, max_workers=None, watermark_file=None, future_grants=False):
+    """Discover and plan like a normal run, then write the plan instead of executing it.
+
+    The watermarks are read but not advanced, so the next real run still covers the objects.
+    """
+    conn = {}
+    pool = None
+    try:
+        sf_secret = get_snowflake_info(boto3.session.Session().client('ssm', region_name='us-east-1'))
+        conn = connect_snowflake(sf_secret)
+        pool = ConnectionPool(lambda: connect_snowflake(sf_secret), max_workers or get_max_workers(), QUERY_TAG)
+        recorder = PlanRecorder(pool)
+
+        configs = load_configs()
+        watermarks = WatermarkStore(watermark_file or os.path.join(CONFIG_DIRECTORY, WATERMARK_FILE), read_only=True)
+        run_grant_cycle(conn, recorder, configs, PrivilegeSnapshot(), watermarks, future_grants)
+        write_plan(recorder.statements, output)
+        print(f"Planned {len(recorder.statements)} statements into {output}")
+    except Exception as e:
+        print("Error occurred while planning:", e)
+    finally:
+        if pool:
+            pool.close_all()
+        if conn:
+            conn.close()
+
+
+def apply_main(plan_file, max_workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Execute a saved plan through the batched, parallel executor, without any discovery."""
+    executor = None
+    try:
+        plan = read_plan(plan_file)
+        if not plan:
+            print(f"Nothing to apply in {plan_file}")
+            return []
+        sf_secret = get_snowflake_info(boto3.session.Session().client('ssm', region_name='us-east-1'))
+        pool = ConnectionPool(lambda: connect_snowflake(sf_secret), max_workers or get_max_workers(), QUERY_TAG)
+        executor = GrantExecutor(pool, batch_size)
+        print(f"Applying {len(plan)} statements from {plan_file}")
+        return executor.execute(plan)
+    except Exception as e:
+        print("Error occurred while applying plan:", e)
+        return []
+    finally:
+        if executor:
+            executor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the grant plan without executing it, or apply a saved plan.")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Number of concurrent Snowflake connections (defaults to the CPU count)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan_parser = commands.add_parser("plan", help="Write the GRANT/REVOKE statements a run would execute")
+    plan_parser.add_argument("output", help="Plan file, JSON Lines or a SQL script when it ends in .sql")
+    plan_parser.add_argument("--watermark-file", default=None,
+                             help="State file holding the last processed CREATED timestamps (only read)")
+    plan_parser.add_argument("--future-grants", action="store_true",
+                             help="Also plan ON FUTURE grants for the default permission blocks")
+    apply_parser = commands.add_parser("apply", help="Execute a JSON Lines plan written by the plan command")
+    apply_parser.add_argument("plan_file", help="JSON Lines plan file")
+    apply_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                              help="Grant statements sent per round trip")
+    args = parser.parse_args()
+    if args.command == "plan":
+        plan_main(args.output, args.max_workers, args.watermark_file, args.future_grants)
+    else:
+        apply_main(args.plan_file, args.max_workers, args.batch_size)
@@ -0,0 +1,259 @@
+import logging
+import threading
+
+from run_report import count, timed_call
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+
+# Normalised columns of a grant row in the Arrow tables of the snapshot.
+GRANT_COLUMNS = ["CATALOG", "SCHEMA", "OBJECT", "GRANTEE", "PRIVILEGE"]
+
+
+def object_key(object_type, database, schema, object_name):
+    # Normalise an object to the (catalog, schema, object) triple used by the index.
+    # Schemas are keyed by their own name and databases have no schema part.
+    object_type = (object_type or "").upper()
+    database = (database or "").upper()
+    schema = (schema or "").upper()
+    object_name = (object_name or "").upper()
+    if object_type == "DATABASE":
+        return (object_name or database, "", object_name or database)
+    if object_type == "SCHEMA":
+        return (database, object_name or schema, object_name or schema)
+    return (database, schema, object_name)
+
+
+def grant_rows_table(rows):
+    columns = list(zip(*rows)) if rows else [()] * len(GRANT_COLUMNS)
+    return pa.table({name: pa.array(column, pa.string()) for name, column in zip(GRANT_COLUMNS, columns)})
+
+
+def _upper(column, default=""):
+    return pc.utf8_upper(pc.fill_null(column.cast(pa.string()), default))
+
+
+def grants_table_from_batches(batches, database):
+    """OBJECT_PRIVILEGES Arrow batches normalised to GRANT_COLUMNS, without a Python loop per row.
+
+    Keys follow object_key: databases have no schema part and schemas are keyed by their own name.
+    """
+    tables = [batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch]) for batch in batches]
+    tables = [table for table in tables if table.num_rows]
+    if not tables:
+        return grant_rows_table([])
+    table = pa.concat_tables(tables)
+    catalog = _upper(table["OBJECT_CATALOG"], database)
+    schema = _upper(table["OBJECT_SCHEMA"])
+    name = _upper(table["OBJECT_NAME"])
+    object_type = _upper(table["OBJECT_TYPE"])
+    empty = pa.scalar("", pa.string())
+
+    is_database = pc.equal(object_type, "DATABASE")
+    is_schema = pc.equal(object_type, "SCHEMA")
+    name_or_catalog = pc.if_else(pc.equal(name, ""), catalog, name)
+    name_or_schema = pc.if_else(pc.equal(name, ""), schema, name)
+    return pa.table({
+        "CATALOG": pc.if_else(is_database, name_or_catalog, catalog),
+        "SCHEMA": pc.if_else(is_database, empty, pc.if_else(is_schema, name_or_schema, schema)),
+        "OBJECT": pc.if_else(is_database, name_or_catalog, pc.if_else(is_schema, name_or_schema, name)),
+        "GRANTEE": _upper(table["GRANTEE"]),
+        "PRIVILEGE": _upper(table["PRIVILEGE_TYPE"]),
+    })
+
+
+def apply_changes(table, changes):
+    # changes is {grant row: True if added, False if removed} recorded since the table was loaded.
+    if not changes:
+        return table
+    table = table.join(grant_rows_table(list(changes)), keys=GRANT_COLUMNS, join_type="left anti")
+    added = [row for row, granted in changes.items() if granted]
+    if added:
+        table = pa.concat_tables([table.select(GRANT_COLUMNS), grant_rows_table(added)])
+    return table.select(GRANT_COLUMNS)
+
+
+def privileges_query(database, schemas=None):
+    query = f"""
+            SELECT OBJECT_CATALOG, OBJECT_SCHEMA, OBJECT_NAME, OBJECT_TYPE, GRANTEE, PRIVILEGE_TYPE
+            FROM {database}.INFORMATION_SCHEMA.OBJECT_PRIVILEGES
+        """
+    if schemas:
+        schema_list = ", ".join(f"'{schema.upper()}'" for schema in sorted(schemas))
+        query += f"""
+            WHERE OBJECT_TYPE IN ('DATABASE', 'SCHEMA') OR OBJECT_SCHEMA IN ({schema_list})
+            """
+    elif schemas is not None:
+        # An empty schema list loads the database and schema grants only.
+        query += """
+            WHERE OBJECT_TYPE IN ('DATABASE', 'SCHEMA')
+            """
+    return query
+
+
+class PrivilegeSnapshot:
+    """In-memory index of the privileges granted on objects of the loaded databases.
+
+    Grants are pulled once per database from INFORMATION_SCHEMA.OBJECT_PRIVILEGES and
+    indexed by (catalog, schema, object, grantee, privilege), so each existence check
+    is a dictionary lookup instead of a warehouse query.
+
+    When pyarrow is installed and the cursor offers Arrow batches, a database is kept
+    as an Arrow table plus the grants changed since, for the vectorized diff in
+    grant_diff. The dictionary index of such a database is only built on first lookup.
+    """
+
+    def __init__(self):
+        # {catalog: {(schema, object): {grantee: {privilege, ...}}}}
+        self._grants = {}
+        self._databases = set()
+        # Arrow-backed catalogs: {catalog: table} and {catalog: {grant row: granted}}.
+        self._tables = {}
+        self._changes = {}
+        # Grants are recorded from the parallel executor's worker threads.
+        self._lock = threading.RLock()
+        # Optional role_hierarchy.RoleGraph; merge plans skip privileges a grantee already inherits.
+        self.role_graph = None
+
+    def has_database(self, database):
+        return (database or "").upper() in self._databases
+
+    def load(self, connection, database, schemas=None):
+        database = (database or "").upper()
+        if not database:
+            return False
+        try:
+            with timed_call("snapshot.load"):
+                cursor = connection.cursor()
+                cursor.execute(privileges_query(database, schemas))
+        except Exception as e:
+            print(f"Error occurred while loading privilege snapshot for database {database}:", e)
+            return False
+        return self.load_results(cursor, database)
+
+    def load_results(self, cursor, database):
+        # Read the result of privileges_query(database) from a cursor that has executed it.
+        table = None
+        rows = []
+        try:
+            with timed_call("snapshot.fetch"):
+                if pa is not None and hasattr(cursor, "fetch_arrow_batches"):
+                    table = grants_table_from_batches(cursor.fetch_arrow_batches(), database)
+                else:
+                    rows = cursor.fetchall()
+        except Exception as e:
+            print(f"Error occurred while loading privilege snapshot for database {database}:", e)
+            return False
+
+        self.discard_database(database)
+        if table is not None:
+            with self._lock:
+                self._tables[database] = table
+                self._changes[database] = {}
+        for catalog, schema, object_name, object_type, grantee, privilege_type in rows:
+            self.add(object_type, catalog or database, schema, object_name, grantee, privilege_type)
+        with self._lock:
+            self._databases.add(database)
+        loaded = table.num_rows if table is not None else len(rows)
+        count("snapshot.privileges", loaded)
+        logging.info(f"Loaded {loaded} privileges for database {database}")
+        return True
+
+    def load_databases(self, connection, databases, schemas_by_database=None, engine=None):
+        # With an AsyncQueryEngine the queries of all databases are in flight at once.
+        schemas_by_database = schemas_by_database or {}
+        databases = sorted({(database or "").upper() for database in databases if database})
+        if engine is None:
+            for database in databases:
+                self.load(connection, database, schemas_by_database.get(database))
+            return
+        queries = [(database, privileges_query(database, schemas_by_database.get(database))) for database in databases]
+        for database, cursor, error in engine.iter_completed(connection, queries, "privilege snapshot"):
+            if error is not None:
+                print(f"Error occurred while loading privilege snapshot for database {database}:", error)
+            else:
+                self.load_results(cursor, database)
+
+    def discard_database(self, database):
+        database = (database or "").upper()
+        with self._lock:
+            self._grants.pop(database, None)
+            self._tables.pop(database, None)
+            self._changes.pop(database, None)
+            self._databases.discard(database)
+
+    def grants_table(self, catalog, schemas=None):
+        # Current grants of an Arrow-backed catalog, optionally of some schemas only, or None
+        # once it only lives in the dictionary.
+        with self._lock:
+            table = self._tables.get(catalog)
+            if table is None:
+                return None
+            changes = self._changes.get(catalog)
+            if schemas is not None:
+                table = table.filter(pc.is_in(table["SCHEMA"], value_set=pa.array(sorted(schemas), pa.string())))
+                changes = {row: granted for row, granted in (changes or {}).items() if row[1] in schemas}
+            return apply_changes(table, changes)
+
+    def _materialize(self, catalog):
+        # Move an Arrow-backed catalog into the dictionary index, replaying the changes since its load.
+        with self._lock:
+            table = self._tables.pop(catalog, None)
+            if table is None:
+                return
+            changes = self._changes.pop(catalog, {})
+            objects = self._grants.setdefault(catalog, {})
+            for row in table.to_pylist():
+                (objects.setdefault((row["SCHEMA"], row["OBJECT"]), {})
+                 .setdefault(row["GRANTEE"], set()).add(row["PRIVILEGE"]))
+            for (_, schema, object_name, grantee, privilege), granted in changes.items():
+                privileges = objects.setdefault((schema, object_name), {}).setdefault(grantee, set())
+                if granted:
+                    privileges.add(privilege)
+                else:
+                    privileges.discard(privilege)
+
+    def _grantees(self, object_type, database, schema, object_name, create=False):
+        catalog, schema, object_name = object_key(object_type, database, schema, object_name)
+        if catalog in self._tables:
+            self._materialize(catalog)
+        if create:
+            return self._grants.setdefault(catalog, {}).setdefault((schema, object_name), {})
+        return self._grants.get(catalog, {}).get((schema, object_name), {})
+
+    def _record_change(self, object_type, database, schema, object_name, grantee, privilege_type, granted):
+        # Changes to an Arrow-backed catalog are recorded instead of building its dictionary.
+        catalog, schema, object_name = object_key(object_type, database, schema, object_name)
+        if catalog not in self._tables:
+            return False
+        row = (catalog, schema, object_name, (grantee or "").upper(), (privilege_type or "").upper())
+        self._changes.setdefault(catalog, {})[row] = granted
+        return True
+
+    def privileges(self, object_type, database, schema, object_name, grantee):
+        grantees = self._grantees(object_type, database, schema, object_name)
+        return grantees.get((grantee or "").upper(), set())
+
+    def exists(self, object_type, database, schema, object_name, grantee, privilege_type):
+        privileges = self.privileges(object_type, database, schema, object_name, grantee)
+        return (privilege_type or "").upper() in privileges
+
+    def add(self, object_type, database, schema, object_name, grantee, privilege_type):
+        with self._lock:
+            if self._record_change(object_type, database, schema, object_name, grantee, privilege_type, True):
+                return
+            grantees = self._grantees(object_type, database, schema, object_name, create=True)
+            grantees.setdefault((grantee or "").upper(), set()).add((privilege_type or "").upper())
+
+    def remove(self, object_type, database, schema, object_name, grantee, privilege_type):
+        with self._lock:
+            if self._record_change(object_type, database, schema, object_name, grantee, privilege_type, False):
+                return
+            grantees = self._grantees(object_type, database, schema, object_name)
+            grantees.get((grantee or "").upper(), set()).discard((privilege_type or "").upper())
+
@@ -0,0 +1,147 @@
+from grant_executor import map_with_connections
+from privilege_snapshot import object_key
+from run_report import count, timed_call
+from show_metadata import parse_grant_row, show_rows
+
+
+def list_role_grants(connection, role):
+    """Direct grants of a role and the roles granted to it, from SHOW GRANTS TO ROLE.
+
+    Returns ([(object_type, database, schema, object_name, privilege), ...], {child role, ...}).
+    """
+    try:
+        with timed_call("role_graph.query"):
+            rows = show_rows(connection, f"SHOW GRANTS TO ROLE {role}")
+        count("role_graph.queries")
+    except Exception as e:
+        print(f"Error occurred while listing grants of role {role}:", e)
+        return [], set()
+    grants = []
+    children = set()
+    for row in rows:
+        if (row.get("granted_on") or "").upper() == "ROLE":
+            children.add((row.get("name") or "").upper())
+            continue
+        grant = parse_grant_row(row)
+        if grant is not None:
+            object_type, database, schema, object_name, _, privilege = grant
+            grants.append((object_type, database, schema, object_name, privilege))
+    return grants, children
+
+
+def list_role_holders(connection, role):
+    # Roles the role is granted to, from SHOW GRANTS OF ROLE; users are left out.
+    try:
+        with timed_call("role_graph.query"):
+            rows = show_rows(connection, f"SHOW GRANTS OF ROLE {role}")
+        count("role_graph.queries")
+    except Exception as e:
+        print(f"Error occurred while listing holders of role {role}:", e)
+        return set()
+    return {(row.get("grantee_name") or "").upper() for row in rows
+            if (row.get("granted_to") or "").upper() == "ROLE"}
+
+
+class RoleGraph:
+    """Role hierarchy and effective privileges, built from SHOW GRANTS TO/OF ROLE.
+
+    A role holds the privileges of every role granted to it, transitively. The closure
+    is computed once when the graph is built, so effective-privilege checks are
+    dictionary lookups. The graph covers the roles it was built from and the roles they
+    inherit; with `ancestors`, also every role inheriting them and what those inherit.
+    """
+
+    def __init__(self):
+        # {role: {role granted to it}} and the reverse {role: {role it is granted to}}.
+        self.children = {}
+        self.parents = {}
+        # {role: [(object_type, database, schema, object_name, privilege), ...]} of direct grants.
+        self.direct = {}
+        # {role: frozenset of the roles it inherits, itself included}.
+        self.inherited = {}
+        # {object key: {role: {privilege: role holding it directly}}}.
+        self._effective = {}
+
+    @classmethod
+    def load(cls, connection, roles, pool=None, ancestors=False):
+        graph = cls()
+        pending = sorted({role.upper() for role in roles if role})
+        seen = set(pending)
+        while pending:
+            # One level of the hierarchy at a time, over the pool when there is one.
+            if pool is not None:
+                listings = map_with_connections(pool, pending, list_role_grants)
+            else:
+                listings = [list_role_grants(connection, role) for role in pending]
+            discovered = set()
+            for role, (grants, children) in zip(pending, listings):
+                graph.direct[role] = grants
+                graph.children[role] = children
+                for child in children:
+                    graph.parents.setdefault(child, set()).add(role)
+                discovered.update(children)
+            if ancestors:
+                if pool is not None:
+                    holders = map_with_connections(pool, pending, list_role_holders)
+                else:
+                    holders = [list_role_holders(connection, role) for role in pending]
+                for role, parents in zip(pending, holders):
+                    for parent in parents:
+                        graph.parents.setdefault(role, set()).add(parent)
+                    discovered.update(parents)
+            pending = sorted(discovered - seen)
+            seen.update(pending)
+        graph.compute_closure()
+        count("role_graph.roles", len(graph.direct))
+        return graph
+
+    def _closure(self, role, visiting):
+        if role in self.inherited:
+            return self.inherited[role]
+        if role in visiting:
+            # Snowflake rejects cyclic role grants; stop rather than recurse forever.
+            return frozenset([role])
+        visiting.add(role)
+        roles = {role}
+        for child in self.children.get(role, ()):
+            roles |= self._closure(child, visiting)
+        visiting.discard(role)
+        self.inherited[role] = frozenset(roles)
+        return self.inherited[role]
+
+    def compute_closure(self):
+        self.inherited = {}
+        for role in self.direct:
+            self._closure(role, set())
+        holders = {}
+        for role, roles in self.inherited.items():
+            for inherited_role in roles:
+                holders.setdefault(inherited_role, set()).add(role)
+        self._effective = {}
+        for role, grants in self.direct.items():
+            for object_type, database, schema, object_name, privilege in grants:
+                key = object_key(object_type, database, schema, object_name)
+                for holder in holders.get(role, ()):
+                    privileges = self._effective.setdefault(key, {}).setdefault(holder, {})
+                    # A direct grant wins over the same privilege inherited.
+                    if holder == role or privilege not in privileges:
+                        privileges[privilege] = role
+
+    def effective_privileges(self, role, object_type, database, schema, object_name):
+        # {privilege: role holding it directly} of everything the role can use on the object.
+        return self._effective.get(object_key(object_type, database, schema, object_name), {}).get(role.upper(), {})
+
+    def has_privilege(self, role, object_type, database, schema, object_name, privilege):
+        return privilege.upper() in self.effective_privileges(role, object_type, database, schema, object_name)
+
+    def inherited_from(self, role, object_type, database, schema, object_name, privilege):
+        """Role the privilege is inherited from, or None when it is missing or granted directly."""
+        source = self.effective_privileges(role, object_type, database, schema, object_name).get(privilege.upper())
+        return source if source and source != role.upper() else None
+
+    def roles_with_privilege(self, object_type, database, schema, object_name, privilege):
+        # {role: role holding it directly} of every role in the graph that can use the privilege.
+        privilege = privilege.upper()
+        grantees = self._effective.get(object_key(object_type, database, schema, object_name), {})
+        return {role: privileges[privilege] for role, privileges in sorted(grantees.items())
+                if privilege in privileges}
@@ -0,0 +1,179 @@
+import cProfile
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; the last bucket is open.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        milliseconds = seconds * 1000
+        for position, bound in enumerate(LATENCY_BUCKETS_MS):
+            if milliseconds <= bound:
+                self.buckets[position] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank, in milliseconds.
+        rank = fraction * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return LATENCY_BUCKETS_MS[position] if position < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total_seconds, 4),
+            "mean_ms": round(self.total_seconds * 1000 / self.count, 2) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max_seconds * 1000, 2),
+            "buckets": {label: count for label, count in zip(labels, self.buckets) if count},
+        }
+
+
+class RunReport:
+    """Timers, counters and latency histograms of one run, safe to update from worker threads.
+
+    Phase timers add up the time spent in a phase across threads, so concurrent phases
+    can exceed the wall time of the run.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.wall_seconds = None
+        self.phases = {}
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+                phase["seconds"] += elapsed
+                phase["calls"] += 1
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.histograms.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self._started
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "wall_seconds": round(self.wall_seconds if self.wall_seconds is not None
+                                      else time.perf_counter() - self._started, 3),
+                "phases": {name: {"seconds": round(phase["seconds"], 3), "calls": phase["calls"]}
+                           for name, phase in sorted(self.phases.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "latency": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def summary_lines(self):
+        report = self.to_dict()
+        lines = [f"Run report: {report['wall_seconds']}s wall time"]
+        for name, phase in report["phases"].items():
+            lines.append(f"    {name}: {phase['seconds']}s in {phase['calls']} calls")
+        for name, value in report["counters"].items():
+            lines.append(f"    {name}: {value}")
+        for name, latency in report["latency"].items():
+            lines.append(f"    {name} latency: {latency['count']} calls, mean {latency['mean_ms']}ms, "
+                         f"p95 <={latency['p95_ms']}ms, max {latency['max_ms']}ms")
+        return lines
+
+    def write(self, file_path):
+        try:
+            with open(file_path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=4)
+        except Exception as e:
+            print(f"Error occurred while writing run report {file_path}:", e)
+
+
+# The report of the run in progress. Instrumented code records into it through the
+# helpers below, so the report does not have to be passed through every call.
+_current = RunReport()
+
+
+def start_run_report():
+    global _current
+    _current = RunReport()
+    return _current
+
+
+def current_report():
+    return _current
+
+
+def phase(name):
+    return _current.phase(name)
+
+
+def count(name, amount=1):
+    _current.count(name, amount)
+
+
+def observe(name, seconds):
+    _current.observe(name, seconds)
+
+
+@contextmanager
+def timed_call(name):
+    # Records the latency of one call into the histogram `name`.
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current.observe(name, time.perf_counter() - started)
+
+
+@contextmanager
+def profiled(file_path=None):
+    """Profile the block with cProfile and dump the stats to `file_path`, if one is given.
+
+    Only the calling thread is profiled; pooled workers show up in the run report instead.
+    """
+    if not file_path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(file_path)
+        print(f"Profile written to {file_path}")
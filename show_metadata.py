@@ -0,0 +1,243 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from discovery import DiscoveredObject, DiscoveryStream
+from discovery_watermark import DEFAULT_LOOKBACK_MINUTES
+from privilege_snapshot import PrivilegeSnapshot
+from run_report import count, timed_call
+
+
+# Metadata backends: INFORMATION_SCHEMA queries run on the session's warehouse, while
+# SHOW commands are answered by the cloud services layer and never resume it.
+INFORMATION_SCHEMA_METADATA = "information_schema"
+SHOW_METADATA = "show"
+METADATA_BACKENDS = (INFORMATION_SCHEMA_METADATA, SHOW_METADATA)
+
+# SHOW returns at most this many rows; larger listings are paged with LIMIT ... FROM.
+SHOW_ROW_LIMIT = 10000
+
+SHOW_OBJECT_KINDS = {"TABLE": "TABLES", "VIEW": "VIEWS", "SCHEMA": "SCHEMAS"}
+GRANTABLE_OBJECT_TYPES = ("TABLE", "VIEW", "SCHEMA", "DATABASE")
+
+
+def show_rows(connection, command):
+    # SHOW output as dicts keyed by lower-case column name.
+    cursor = connection.cursor()
+    cursor.execute(command)
+    columns = [column[0].lower() for column in cursor.description or []]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def show_paged(connection, command):
+    """Run a SHOW command scoped to one schema, paging past the SHOW row limit by name."""
+    rows = []
+    start = None
+    while True:
+        page = show_rows(connection, f"{command} LIMIT {SHOW_ROW_LIMIT}" + (f" FROM '{start}'" if start else ""))
+        rows.extend(row for row in page if row.get("name") != start)
+        if len(page) < SHOW_ROW_LIMIT:
+            return rows
+        start = page[-1]["name"]
+
+
+def split_name(name):
+    # Parts of a qualified name from SHOW GRANTS, e.g. DB.SCHEMA."my table".
+    parts = []
+    current = []
+    quoted = False
+    position = 0
+    while position < len(name):
+        char = name[position]
+        if char == '"':
+            if quoted and name[position + 1:position + 2] == '"':
+                current.append('"')
+                position += 1
+            else:
+                quoted = not quoted
+        elif char == "." and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        position += 1
+    parts.append("".join(current))
+    return parts
+
+
+def as_utc(timestamp):
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def list_show_objects(connection, object_type, database):
+    if object_type == "DATABASE":
+        return show_rows(connection, "SHOW TERSE DATABASES")
+    kind = SHOW_OBJECT_KINDS[object_type]
+    rows = show_rows(connection, f"SHOW TERSE {kind} IN DATABASE {database}")
+    if len(rows) < SHOW_ROW_LIMIT or object_type == "SCHEMA":
+        return rows
+    # The database holds more objects than one SHOW returns; list it schema by schema.
+    rows = []
+    for schema in show_rows(connection, f"SHOW TERSE SCHEMAS IN DATABASE {database}"):
+        if schema["name"].upper() != "INFORMATION_SCHEMA":
+            rows.extend(show_paged(connection, f"SHOW TERSE {kind} IN SCHEMA {database}.{schema['name']}"))
+    return rows
+
+
+def show_recent_objects(connection, database, object_type, watermarks=None):
+    """New objects of one type, listed with SHOW and filtered on created_on client-side."""
+    object_type = object_type.upper()
+    watermark_database = None if object_type == "DATABASE" else database
+    since = watermarks.since(watermark_database, object_type) if watermarks is not None else None
+    if since is None:
+        since = datetime.now(timezone.utc) - timedelta(minutes=DEFAULT_LOOKBACK_MINUTES)
+    since = as_utc(since)
+    try:
+        with timed_call("discovery.query"):
+            rows = list_show_objects(connection, object_type, database)
+        count("discovery.queries")
+    except Exception as e:
+        print(f"Error occurred while listing {object_type.lower()}s of {database or 'the account'}:", e)
+        return []
+
+    objects = []
+    for row in rows:
+        created = row.get("created_on")
+        if created is None or as_utc(created) < since:
+            continue
+        name = row["name"]
+        if object_type == "DATABASE":
+            obj = DiscoveredObject(name, created, name, None, object_type)
+        elif object_type == "SCHEMA":
+            if name.upper() == "INFORMATION_SCHEMA":
+                continue
+            obj = DiscoveredObject(name, created, row.get("database_name") or database, name, object_type)
+        else:
+            if object_type == "TABLE" and "TEMPORARY" in (row.get("kind") or "").upper():
+                continue
+            if (row.get("schema_name") or "").upper() == "INFORMATION_SCHEMA":
+                continue
+            obj = DiscoveredObject(name, created, row.get("database_name") or database, row.get("schema_name"),
+                                   object_type)
+        objects.append(obj)
+        if watermarks is not None:
+            watermarks.observe(watermark_database, object_type, created)
+    count("discovery.objects", len(objects))
+    return objects
+
+
+class ShowDiscoveryStream(DiscoveryStream):
+    """DiscoveryStream listing the objects with SHOW TERSE instead of INFORMATION_SCHEMA.
+
+    SHOW has no filter on the creation time, so every object of a database is listed and
+    the watermark is applied client-side. The listing runs without a warehouse.
+    """
+
+    def batches(self, connection, pool, databases, engine=None):
+        # The SHOW listings are cheap and stay on the pooled threads.
+        return super().batches(connection, pool, databases)
+
+    def discover(self, connection, database, object_types):
+        objects = []
+        for object_type in object_types:
+            objects.extend(show_recent_objects(connection, database, object_type, self.watermarks))
+        for start in range(0, len(objects), self.fetch_size):
+            yield objects[start:start + self.fetch_size]
+
+
+def parse_grant_row(row):
+    # (object_type, database, schema, object_name, grantee, privilege) of a SHOW GRANTS row.
+    object_type = (row.get("granted_on") or "").upper()
+    if object_type not in GRANTABLE_OBJECT_TYPES:
+        return None
+    parts = split_name(row.get("name") or "")
+    if object_type == "DATABASE":
+        database, schema, object_name = parts[0], None, parts[0]
+    elif object_type == "SCHEMA" and len(parts) >= 2:
+        database, schema, object_name = parts[0], parts[1], parts[1]
+    elif len(parts) >= 3:
+        database, schema, object_name = parts[0], parts[1], parts[2]
+    else:
+        return None
+    return (object_type, database.upper(), schema.upper() if schema else None, object_name.upper(),
+            (row.get("grantee_name") or "").upper(), (row.get("privilege") or "").upper())
+
+
+class ShowPrivilegeSnapshot(PrivilegeSnapshot):
+    """PrivilegeSnapshot read with SHOW GRANTS TO ROLE instead of OBJECT_PRIVILEGES.
+
+    Only the grants of the configured roles are loaded, as the plans never look at other
+    grantees. Each role is listed once, on the first load, and its grants are then handed
+    out per database.
+    """
+
+    def __init__(self, roles):
+        super().__init__()
+        self.roles = sorted({role.upper() for role in roles})
+        # {database: [grant row, ...]} of the configured roles, once listed.
+        self._role_grants = None
+        self._roles_lock = threading.Lock()
+
+    def _list_role_grants(self, connection):
+        with self._roles_lock:
+            if self._role_grants is not None:
+                return self._role_grants
+            grants = {}
+            for role in self.roles:
+                try:
+                    with timed_call("snapshot.load"):
+                        rows = show_rows(connection, f"SHOW GRANTS TO ROLE {role}")
+                except Exception as e:
+                    print(f"Error occurred while listing grants of role {role}:", e)
+                    return None
+                for row in rows:
+                    grant = parse_grant_row(row)
+                    if grant is not None:
+                        grants.setdefault(grant[1], []).append(grant)
+            self._role_grants = grants
+            return grants
+
+    def load(self, connection, database, schemas=None):
+        database = (database or "").upper()
+        if not database:
+            return False
+        grants = self._list_role_grants(connection)
+        if grants is None:
+            return False
+        rows = grants.get(database, [])
+        if schemas is not None:
+            schemas = {schema.upper() for schema in schemas}
+            rows = [row for row in rows if row[0] in ("DATABASE", "SCHEMA") or row[2] in schemas]
+        self.discard_database(database)
+        for row in rows:
+            self.add(*row)
+        with self._lock:
+            self._databases.add(database)
+        count("snapshot.privileges", len(rows))
+        return True
+
+    def load_databases(self, connection, databases, schemas_by_database=None, engine=None):
+        # Every database comes out of the same role listings, so there is nothing to overlap.
+        super().load_databases(connection, databases, schemas_by_database)
+
+
+def config_roles(configs):
+    roles = set()
+    for config in configs:
+        for item in config:
+            for grant in item.get("grantee", item.get("GRANTEE", [])):
+                roles.update(grantee.upper() for grantee in grant)
+    return roles
+
+
+def create_snapshot(metadata, configs):
+    if metadata == SHOW_METADATA:
+        return ShowPrivilegeSnapshot(config_roles(configs))
+    return PrivilegeSnapshot()
+
+
+def create_discovery_stream(metadata, object_types, watermarks=None):
+    if metadata == SHOW_METADATA:
+        return ShowDiscoveryStream(object_types, watermarks)
+    return DiscoveryStream(object_types, watermarks)
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from run_report import count
+
+
+# Defaults of the per-statement retries: up to 5 attempts, backing off 0.5s, 1s, 2s, ...
+# with full jitter and never more than 30s between two attempts.
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 30
+# Throttling errors arriving within this window count as one congestion signal.
+DEFAULT_DECREASE_COOLDOWN_SECONDS = 1.0
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+
+# errno of throttled requests: the HTTP status 429, and the Snowflake errors of
+# statements waiting on a busy warehouse or lock, 625 (too many waiters for a lock)
+# and 630 (statement or queued timeout), raised as ProgrammingError.
+THROTTLED_ERRNOS = {429, 625, 630}
+# Only checked for errors the connector does not classify itself.
+THROTTLING_MARKERS = ("throttl", "too many", "rate limit", "concurrency limit", "queued", "429")
+TRANSIENT_MARKERS = ("timeout", "timed out", "temporarily", "service unavailable", "connection reset",
+                     "connection aborted", "502", "503", "504")
+# Connector exception types raised for network and service-side failures.
+TRANSIENT_ERROR_TYPES = {"OperationalError", "InterfaceError", "ServiceUnavailableError", "GatewayTimeoutError",
+                         "BadGatewayError", "OtherHTTPRetryableError", "RequestTimeoutError",
+                         "ConnectionError", "TimeoutError"}
+
+
+def classify_error(error):
+    if getattr(error, "errno", None) in THROTTLED_ERRNOS:
+        return THROTTLED
+    if type(error).__name__ == "ProgrammingError":
+        # SQL errors such as a missing object or role fail the same way every time. Their
+        # messages quote object names, e.g. DB.S.QUEUED_ORDERS, so they are never searched.
+        return PERMANENT
+    if type(error).__name__ in TRANSIENT_ERROR_TYPES:
+        return TRANSIENT
+    message = str(error).lower()
+    if any(marker in message for marker in THROTTLING_MARKERS):
+        return THROTTLED
+    if any(marker in message for marker in TRANSIENT_MARKERS):
+        return TRANSIENT
+    return PERMANENT
+
+
+class AdaptiveLimiter:
+    """AIMD limit on the number of requests in flight across all executor workers.
+
+    Every success raises the limit by 1/limit, about one more request per round of
+    `limit` requests, up to `max_limit`. A throttling error halves it, at most once
+    per cooldown, so a burst of errors from the same congestion is not counted twice.
+    """
+
+    def __init__(self, max_limit, min_limit=1, cooldown_seconds=DEFAULT_DECREASE_COOLDOWN_SECONDS):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.cooldown_seconds = cooldown_seconds
+        self.limit = float(self.max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def permit(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            if self.limit < self.max_limit:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown_seconds:
+                return
+            self._last_decrease = now
+            limit = max(float(self.min_limit), self.limit / 2)
+            if int(limit) < int(self.limit):
+                print(f"        Throttled, lowering concurrency to {int(limit)}")
+            self.limit = limit
+
+
+class RetryPolicy:
+    """Retries transient and throttling errors with exponential backoff and full jitter."""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay_seconds=DEFAULT_BASE_DELAY_SECONDS,
+                 max_delay_seconds=DEFAULT_MAX_DELAY_SECONDS):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** attempt))
+
+    def call(self, fn, limiter=None, description="request"):
+        """Run fn, holding a limiter permit per attempt; the last error is raised once retries run out."""
+        for attempt in range(self.max_attempts):
+            try:
+                if limiter is None:
+                    result = fn()
+                else:
+                    with limiter.permit():
+                        result = fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == THROTTLED:
+                    count("execution.throttled")
+                    if limiter is not None:
+                        limiter.on_throttle()
+                if kind == PERMANENT or attempt == self.max_attempts - 1:
+                    raise
+                delay = self.delay(attempt)
+                count("execution.retries")
+                print(f"        {kind.capitalize()} error on {description}, retrying in {delay:.1f}s:", e)
+                time.sleep(delay)
+                continue
+            if limiter is not None:
+                limiter.on_success()
+            return result
+
+    async def call_async(self, fn, limiter=None, description="request"):
+        """Like call, for a coroutine function; the caller bounds the requests in flight itself."""
+        for attempt in range(self.max_attempts):
+            try:
+                result = await fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == THROTTLED:
+                    count("execution.throttled")
+                    if limiter is not None:
+                        limiter.on_throttle()
+                if kind == PERMANENT or attempt == self.max_attempts - 1:
+                    raise
+                delay = self.delay(attempt)
+                count("execution.retries")
+                print(f"        {kind.capitalize()} error on {description}, retrying in {delay:.1f}s:", e)
+                await asyncio.sleep(delay)
+                continue
+            if limiter is not None:
+                limiter.on_success()
+            return result